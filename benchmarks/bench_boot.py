@@ -0,0 +1,57 @@
+"""
+Boot-time benchmark: eager versus deferred spec generation.
+
+Run with ``python benchmarks/bench_boot.py [model counts...]``.
+"""
+
+import sys
+import time
+
+from flask import Flask
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+
+from flask_restless_swagger import SwagAPIManager
+
+
+def make_models(count):
+    base = declarative_base()
+    return [
+        type(
+            "Model{0}".format(i),
+            (base,),
+            {
+                "__tablename__": "model{0}".format(i),
+                "id": Column(Integer, primary_key=True),
+                "name": Column(String(32)),
+                "value": Column(Integer),
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def boot(models, spec_build):
+    session = scoped_session(sessionmaker(bind=create_engine("sqlite://")))
+    app = Flask(__name__)
+    started = time.perf_counter()
+    manager = SwagAPIManager(app, session=session, spec_build=spec_build)
+    for model in models:
+        manager.create_api(model, methods=["GET", "POST", "PATCH", "DELETE"])
+    booted = time.perf_counter() - started
+    started = time.perf_counter()
+    app.test_client().get("/dbdoc.json")
+    return booted, time.perf_counter() - started
+
+
+def main(counts):
+    print("%8s %8s %12s %14s" % ("models", "mode", "boot (s)", "first doc (s)"))
+    for count in counts:
+        models = make_models(count)
+        for mode in ("eager", "lazy"):
+            booted, first_doc = boot(models, mode)
+            print("%8d %8s %12.3f %14.3f" % (count, mode, booted, first_doc))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 500, 5000])
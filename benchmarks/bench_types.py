@@ -0,0 +1,81 @@
+"""
+Per-column cost of resolving swagger types on a wide table.
+
+Compares the old ``str(column.type)`` parsing against the MRO-based
+:class:`~flask_restless_swagger.TypeResolver`. Run with
+``python benchmarks/bench_types.py [column count]``.
+"""
+
+import sys
+import timeit
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    types,
+)
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.orm import declarative_base
+
+from flask_restless_swagger import sqlalchemy_swagger_type, type_resolver
+
+
+class Trimmed(types.TypeDecorator):
+    impl = String
+    cache_ok = True
+
+
+COLUMN_TYPES = [
+    lambda: Integer(),
+    lambda: BigInteger(),
+    lambda: String(64),
+    lambda: Text(),
+    lambda: Numeric(12, 2),
+    lambda: Boolean(),
+    lambda: Date(),
+    lambda: DateTime(),
+    lambda: postgresql.TIMESTAMP(timezone=True),
+    lambda: mysql.VARCHAR(32, charset="utf8mb4"),
+    lambda: Trimmed(16),
+]
+
+
+def make_wide_model(width):
+    attrs = {"__tablename__": "wide", "id": Column(Integer, primary_key=True)}
+    for i in range(width):
+        attrs["c%d" % i] = Column(COLUMN_TYPES[i % len(COLUMN_TYPES)]())
+    return type("Wide", (declarative_base(),), attrs)
+
+
+def by_string(column_type):
+    name = str(column_type)
+    if "(" in name:
+        name = name.split("(")[0]
+    return sqlalchemy_swagger_type.get(name)
+
+
+def main(width):
+    column_types = [c.type for c in make_wide_model(width).__table__.columns]
+    rounds = 20
+    for label, resolve in (
+        ("str(type)", by_string),
+        ("resolver", type_resolver.resolve),
+    ):
+        elapsed = timeit.timeit(
+            lambda: [resolve(t) for t in column_types], number=rounds
+        )
+        print(
+            "%-10s %8.2f us/column"
+            % (label, elapsed / rounds / len(column_types) * 1e6)
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 240)
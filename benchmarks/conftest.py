@@ -0,0 +1,75 @@
+"""
+Fixtures for the spec generation benchmarks.
+
+Requires pytest-benchmark. Run with ``make bench``; results are saved as
+JSON under ``.benchmarks`` and can be compared between commits with
+``pytest-benchmark compare``.
+"""
+
+import tracemalloc
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, ForeignKey, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, relationship, scoped_session, sessionmaker
+
+from flask_restless_swagger import SwagAPIManager
+
+METHODS = ["GET", "POST", "PATCH", "DELETE"]
+
+
+def make_schema(models, columns, relationships):
+    """Declare `models` SQLite models with `columns` extra columns each.
+
+    Every model gets foreign keys to up to `relationships` of the models
+    declared before it.
+    """
+    base = declarative_base()
+    classes = []
+    for i in range(models):
+        attrs = {
+            "__tablename__": "model%d" % i,
+            "id": Column(Integer, primary_key=True),
+        }
+        for j in range(columns):
+            attrs["c%d" % j] = Column(String(32) if j % 2 else Integer)
+        for k, target in enumerate(classes[-relationships:] if relationships else []):
+            attrs["r%d_id" % k] = Column(Integer, ForeignKey(target.id))
+            attrs["r%d" % k] = relationship(target, foreign_keys=[attrs["r%d_id" % k]])
+        classes.append(type("Model%d" % i, (base,), attrs))
+    engine = create_engine("sqlite://")
+    base.metadata.create_all(engine)
+    return classes, scoped_session(sessionmaker(bind=engine))
+
+
+def make_manager(session, **kwargs):
+    app = Flask(__name__)
+    return app, SwagAPIManager(app, session=session, **kwargs)
+
+
+def peak_memory(func, *args, **kwargs):
+    """Peak bytes allocated by one call of `func`."""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(
+    params=[(10, 8, 0), (200, 8, 1), (200, 64, 2), (1000, 8, 1)],
+    ids=lambda p: "models=%d-columns=%d-rels=%d" % p,
+)
+def schema(request):
+    return make_schema(*request.param)
+
+
+@pytest.fixture
+def documented(schema):
+    """A manager with every model of `schema` registered."""
+    models, session = schema
+    app, manager = make_manager(session)
+    for model in models:
+        manager.create_api(model, methods=METHODS)
+    return app, manager
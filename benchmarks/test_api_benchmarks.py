@@ -0,0 +1,169 @@
+"""
+Benchmarks of the generated REST endpoints.
+"""
+
+import pytest
+from conftest import make_manager, make_schema
+
+HEADERS = {"Content-Type": "application/vnd.api+json"}
+
+
+@pytest.fixture
+def api(request):
+    models, session = make_schema(1, 16, 0)
+    app, manager = make_manager(session)
+    manager.create_api(models[0], methods=["GET", "POST"], **request.param)
+    return app.test_client(), models[0]
+
+
+def payload(model, valid):
+    attributes = {"c%d" % j: ("v" if j % 2 else j) for j in range(16)}
+    if not valid:
+        attributes["c0"] = "not an integer"
+    return {"data": {"type": model.__tablename__, "attributes": attributes}}
+
+
+@pytest.mark.parametrize(
+    "api", [{}, {"validate": True}], ids=["plain", "validated"], indirect=True
+)
+@pytest.mark.parametrize("valid", [True, False], ids=["valid", "invalid"])
+def test_post(benchmark, api, valid):
+    client, model = api
+    body = payload(model, valid)
+
+    def post():
+        return client.post("/db/" + model.__tablename__, json=body, headers=HEADERS)
+
+    response = benchmark(post)
+    benchmark.extra_info["status"] = response.status_code
+
+
+BULK_ROWS = 1000
+
+
+@pytest.mark.parametrize("api", [{"bulk": True}], ids=["bulk"], indirect=True)
+@pytest.mark.parametrize("mode", ["per_row", "bulk"])
+def test_create_rows(benchmark, api, mode):
+    """Insert BULK_ROWS rows, one POST each or in a single bulk request."""
+    client, model = api
+    resources = [payload(model, True)["data"] for _ in range(BULK_ROWS)]
+    url = "/db/" + model.__tablename__
+
+    if mode == "bulk":
+
+        def create():
+            client.post(url + "/_bulk", json={"data": resources}, headers=HEADERS)
+
+    else:
+
+        def create():
+            for resource in resources:
+                client.post(url, json={"data": resource}, headers=HEADERS)
+
+    benchmark.pedantic(create, rounds=3, iterations=1)
+    # No stats are collected under --benchmark-disable.
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_second"] = BULK_ROWS / benchmark.stats["mean"]
+
+
+@pytest.mark.parametrize("metrics", [False, True], ids=["plain", "metrics"])
+def test_get_overhead(benchmark, metrics):
+    """Per-request cost of recording metrics on an item GET."""
+    models, session = make_schema(1, 16, 0)
+    app, manager = make_manager(session, metrics=metrics)
+    manager.create_api(models[0], methods=["GET"])
+    session.add(models[0](c0=1))
+    session.commit()
+    client = app.test_client()
+    url = "/db/%s/1" % models[0].__tablename__
+
+    response = benchmark(client.get, url)
+    assert response.status_code == 200
+
+
+ENCODINGS = ["identity", "gzip", "br", "zstd"]
+
+
+@pytest.fixture
+def collection():
+    """A 16-column model with 100 rows and compressed responses."""
+    models, session = make_schema(1, 16, 0)
+    app, manager = make_manager(session, compression=True)
+    manager.create_api(models[0], methods=["GET"], max_page_size=100)
+    session.add_all(
+        models[0](**{"c%d" % j: ("v%d" % i if j % 2 else i * j) for j in range(16)})
+        for i in range(100)
+    )
+    session.commit()
+    return app.test_client(), manager, "/db/%s?page[size]=100" % models[0].__tablename__
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_compressed_collection(benchmark, collection, encoding):
+    """A 100-resource collection page, with bytes on the wire per coding."""
+    from flask_restless_swagger.compression import encoding_available
+
+    if not encoding_available(encoding) and encoding != "identity":
+        pytest.skip("%s is not installed" % encoding)
+    client, manager, url = collection
+    headers = {"Accept-Encoding": encoding}
+    identity = len(client.get(url).data)
+
+    response = benchmark(client.get, url, headers=headers)
+    benchmark.extra_info["bytes"] = len(response.data)
+    benchmark.extra_info["saved"] = 1 - len(response.data) / identity
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS[1:])
+def test_compress_cpu(benchmark, collection, encoding):
+    """CPU time of compressing one 100-resource page."""
+    from flask_restless_swagger.compression import compressors, encoding_available
+
+    if not encoding_available(encoding):
+        pytest.skip("%s is not installed" % encoding)
+    client, _, url = collection
+    body = client.get(url).data
+
+    def compress():
+        compressor = compressors[encoding]()
+        return compressor.compress(body) + compressor.flush()
+
+    benchmark.extra_info["ratio"] = len(benchmark(compress)) / len(body)
+
+
+def wide_model():
+    """A model with 8 short columns and 8 4KB text columns."""
+    from sqlalchemy import Column, Integer, String, Text, create_engine
+    from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+
+    base = declarative_base()
+    attrs = {"__tablename__": "wide", "id": Column(Integer, primary_key=True)}
+    for j in range(8):
+        attrs["c%d" % j] = Column(String(32))
+        attrs["text%d" % j] = Column(Text)
+    model = type("Wide", (base,), attrs)
+    engine = create_engine("sqlite://")
+    base.metadata.create_all(engine)
+    return model, scoped_session(sessionmaker(bind=engine))
+
+
+@pytest.mark.parametrize(
+    "default_fields", [None, ["c0", "c1", "c2"]], ids=["all", "projected"]
+)
+def test_projected_collection(benchmark, default_fields):
+    """A 100-resource page of a wide table, with and without default fields."""
+    model, session = wide_model()
+    app, manager = make_manager(session)
+    manager.create_api(
+        model, methods=["GET"], max_page_size=100, default_fields=default_fields
+    )
+    text = {"text%d" % j: "x" * 4096 for j in range(8)}
+    session.add_all(
+        model(**{"c%d" % j: "v%d" % i for j in range(8)}, **text) for i in range(100)
+    )
+    session.commit()
+    client = app.test_client()
+
+    response = benchmark(client.get, "/db/wide?page[size]=100")
+    assert len(response.get_json()["data"]) == 100
+    benchmark.extra_info["bytes"] = len(response.data)
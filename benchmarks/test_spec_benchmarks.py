@@ -0,0 +1,123 @@
+"""
+Benchmarks of spec generation and doc serving.
+"""
+
+import pytest
+from conftest import METHODS, make_manager, peak_memory
+
+from flask_restless_swagger.serialize import get_json_backend, json_backends
+from flask_restless_swagger.spec import thaw
+
+
+def test_create_api(benchmark, schema):
+    models, session = schema
+
+    def setup():
+        return (make_manager(session)[1],), {}
+
+    def register(manager):
+        for model in models:
+            manager.create_api(model, methods=METHODS)
+
+    benchmark.pedantic(register, setup=setup, rounds=3)
+    benchmark.extra_info["peak_memory"] = peak_memory(register, setup()[0][0])
+
+
+def test_create_apis(benchmark, schema):
+    """The bulk counterpart of :func:`test_create_api`."""
+    models, session = schema
+
+    def setup():
+        return (make_manager(session)[1],), {}
+
+    def register(manager):
+        manager.create_apis(models, {"methods": METHODS})
+
+    benchmark.pedantic(register, setup=setup, rounds=3)
+    benchmark.extra_info["peak_memory"] = peak_memory(register, setup()[0][0])
+
+
+def test_add_defn(benchmark, schema):
+    models, session = schema
+    manager = make_manager(session)[1]
+
+    def add_defns():
+        with manager.spec_store.edit():
+            for model in models:
+                manager.add_defn(model)
+
+    benchmark(add_defns)
+    benchmark.extra_info["peak_memory"] = peak_memory(add_defns)
+
+
+def test_add_path(benchmark, schema):
+    models, session = schema
+    manager = make_manager(session)[1]
+
+    def add_paths():
+        with manager.spec_store.edit():
+            for model in models:
+                manager.add_path(model, methods=METHODS)
+
+    benchmark(add_paths)
+    benchmark.extra_info["peak_memory"] = peak_memory(add_paths)
+
+
+def test_to_json(benchmark, documented):
+    manager = documented[1]
+    benchmark(manager.to_json)
+    benchmark.extra_info["peak_memory"] = peak_memory(manager.to_json)
+    benchmark.extra_info["spec_bytes"] = len(manager.to_json())
+
+
+def test_to_yaml(benchmark, documented):
+    manager = documented[1]
+    benchmark.pedantic(manager.to_yaml, rounds=3)
+    benchmark.extra_info["peak_memory"] = peak_memory(manager.to_yaml)
+
+
+def test_doc_json_cold(benchmark, documented):
+    app, manager = documented
+    client = app.test_client()
+
+    def fetch():
+        manager.doc_cache.clear()
+        return client.get("/dbdoc.json")
+
+    benchmark(fetch)
+    benchmark.extra_info["peak_memory"] = peak_memory(fetch)
+
+
+def test_doc_json_cached(benchmark, documented):
+    app = documented[0]
+    client = app.test_client()
+    client.get("/dbdoc.json")
+    benchmark(client.get, "/dbdoc.json")
+
+
+@pytest.mark.parametrize("backend", sorted(json_backends))
+def test_json_backend(benchmark, documented, backend):
+    manager = documented[1]
+    try:
+        dumps = get_json_backend(backend, compact=True)
+    except ImportError:
+        pytest.skip("%s is not installed" % backend)
+    spec = manager.snapshot.spec
+    benchmark(dumps, spec)
+    benchmark.extra_info["spec_bytes"] = len(dumps(spec))
+
+
+@pytest.mark.parametrize("dumper", ["SafeDumper", "CSafeDumper"])
+def test_yaml_dumper(benchmark, documented, dumper):
+    yaml = pytest.importorskip("yaml")
+    if not hasattr(yaml, dumper):
+        pytest.skip("libyaml is not available")
+    spec = thaw(documented[1].snapshot.spec)
+    benchmark.pedantic(yaml.dump, (spec,), {"Dumper": getattr(yaml, dumper)}, rounds=3)
+
+
+def test_doc_yaml_cached(benchmark, documented):
+    app = documented[0]
+    client = app.test_client()
+    client.get("/dbdoc.yaml")
+    benchmark(client.get, "/dbdoc.yaml")
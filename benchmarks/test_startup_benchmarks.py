@@ -0,0 +1,53 @@
+"""
+Benchmarks of import and app factory time.
+"""
+
+import subprocess
+import sys
+
+import pytest
+from conftest import make_schema
+from flask import Flask
+
+from flask_restless_swagger import SwagAPIManager
+
+#: Modules that must not be imported by ``import flask_restless_swagger``.
+DEFERRED_MODULES = ("flask_restless", "flask_swagger_ui")
+
+
+def importtime(module):
+    """Run ``python -X importtime -c "import <module>"`` in a fresh
+    interpreter; returns the cumulative microseconds of every module."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in output.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import(benchmark):
+    times = benchmark.pedantic(
+        importtime, args=("flask_restless_swagger",), rounds=5, iterations=1
+    )
+    benchmark.extra_info["importtime_us"] = times["flask_restless_swagger"]
+    for module in DEFERRED_MODULES:
+        assert module not in times, "%s is imported eagerly" % module
+
+
+@pytest.mark.parametrize("fast_start", [False, True], ids=["eager", "fast_start"])
+def test_init_app(benchmark, fast_start):
+    _, session = make_schema(1, 4, 0)
+
+    def setup():
+        return (Flask(__name__),), {}
+
+    def init_app(app):
+        SwagAPIManager(app, session=session, fast_start=fast_start)
+
+    benchmark.pedantic(init_app, setup=setup, rounds=50)
@@ -1,19 +1,104 @@
 __original_author__ = "Michael Messmore"
 __original_version__ = "0.2.0"
 __author__ = "Paltis"
+__version__ = "0.2.1"
 
 try:
     import urlparse
 except:
     from urllib import parse as urlparse
 
-import json
-from flask import jsonify, request
-from flask_restless import APIManager
-from flask_restless.helpers import *
-from flask_swagger_ui import get_swaggerui_blueprint
+import functools
+import hashlib
+import ipaddress
+import os
+import threading
+import time
+from collections import deque
+from flask import Response, abort, jsonify, request, send_file
 
+from .bulk import DEFAULT_CHUNK_SIZE, bulk_view
+from .cache import RenderCache, RenderedDoc
+from .cli import swagger_cli
+from .column_types import TypeResolver, type_resolver
+from .compression import ResponseCompressor
+from .fragments import build_fragment, build_index
+from .indexes import indexed_columns, query_guard_preprocessor
+from .instrumentation import Hooks, SpecStats
+from .introspection import inspect_model, is_table_column
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .metrics import Metrics
+from .projection import Projection, fields_parameter
+from .projection import listen as listen_for_projections
+from .response_cache import (
+    CACHE_HEADERS,
+    DEFAULT_TTL,
+    CacheHit,
+    MemoryBackend,
+    ResponseCache,
+    invalidation_postprocessors,
+    lookup_preprocessors,
+)
+from .serialize import dump_json, dump_yaml, get_json_backend, iter_json
+from .shared import SharedSpec, model_signature
+from .spec import SpecStore, changes_since, thaw
+from .ui import lazy_swaggerui_view, swaggerui_blueprint
+from .validation import compile_validator, validation_preprocessors
 
+
+def __getattr__(name):
+    # flask_restless and flask_swagger_ui are only imported once used;
+    # these names used to be importable from here.
+    if name == "APIManager":
+        from flask_restless import APIManager
+
+        return APIManager
+    if name == "get_swaggerui_blueprint":
+        from flask_swagger_ui import get_swaggerui_blueprint
+
+        return get_swaggerui_blueprint
+    if not name.startswith("_"):
+        from flask_restless import helpers
+
+        if hasattr(helpers, name):
+            return getattr(helpers, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def iter_models(models_or_base):
+    """Yield the mapped classes of a declarative base, or the given models.
+
+    A base's registry is read once and its classes are yielded by name,
+    skipping subclasses that share their parent's table.
+    """
+    registry = getattr(models_or_base, "registry", None)
+    if registry is None or not hasattr(registry, "mappers"):
+        for model in models_or_base:
+            yield model
+        return
+    mappers = sorted(registry.mappers, key=lambda mapper: mapper.class_.__name__)
+    for mapper in mappers:
+        if mapper.local_table is None:
+            continue
+        if (
+            mapper.inherits is not None
+            and mapper.local_table is mapper.inherits.local_table
+        ):
+            continue
+        yield mapper.class_
+
+
+def is_required(column):
+    """Whether a value for `column` must be given when creating a row."""
+    return not (
+        column.nullable
+        or column.primary_key
+        or column.default is not None
+        or column.server_default is not None
+    )
+
+
+# Superseded by `inspect_model`; kept for code that imports it.
 def get_columns(model):
     return {
         c.name: getattr(model, c.name)
@@ -22,6 +107,7 @@ def get_columns(model):
     }
 
 
+# Superseded by `type_resolver`; kept for code that imports it.
 sqlalchemy_swagger_type = {
     "INTEGER": "integer",
     "SMALLINT": "int32",
@@ -44,33 +130,239 @@ sqlalchemy_swagger_type = {
 }
 
 
-class SwagAPIManager(object):
-    swagger = {
-        "swagger": "2.0",
-        "info": {"title": "DB API", "version": ""},
-        "consumes": ["application/vnd.api+json"],
-        "produces": ["application/vnd.api+json"],
-        "paths": {},
-        "definitions": {},
-    }
+def edits_spec(func):
+    """Run a method with the spec store locked for writing."""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.spec_store.edit():
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+SPEC_BUILD_MODES = ("eager", "lazy", "background", "shared")
+
+#: Version of the generated spec's layout, part of :meth:`spec_fingerprint`.
+#: Bump it whenever a release changes what is generated from the same
+#: models, so spec files shared by an older release are not served.
+SPEC_FORMAT = 1
+
+#: create_api keyword arguments handled here and not passed to Flask-Restless.
+SWAGGER_OPTIONS = (
+    "exclude_columns",
+    "validate",
+    "query_guard",
+    "bulk",
+    "cache",
+    "compress",
+    "default_fields",
+)
 
+
+def merge_processors(kwargs, kind, processors, last=False):
+    """Return a copy of `kwargs` whose `kind` ("preprocessors" or
+    "postprocessors") runs `processors` before the caller's own, or after
+    them with `last`."""
+    merged = {key: list(value) for key, value in (kwargs.get(kind) or {}).items()}
+    for key, functions in processors.items():
+        if last:
+            merged[key] = merged.get(key, []) + list(functions)
+        else:
+            merged[key] = list(functions) + merged.get(key, [])
+    return dict(kwargs, **{kind: merged})
+
+
+class SwagAPIManager(object):
     def __init__(self, app=None, **kwargs):
         self.app = None
         self.manager = None
+        self.spec_build = "eager"
+        self.spec_artifact = None
+        self._artifact_etags = {}
+        self.spec_path = None
+        self.shared_spec = None
+        self.registrations = []
+        self._fingerprint = None
+        self.url_prefix = None
+        self.type_resolver = type_resolver
+        self._pending = deque()
+        self._background_build = None
+        self.doc_cache = RenderCache()
+        self.fragment_cache = RenderCache(maxsize=1024)
+        self.model_paths = {}
+        self.hooks = Hooks()
+        self.json_backend = "json"
+        self._dumps = get_json_backend(self.json_backend, compact=True)
+        self.stats = None
+        self.metrics = None
+        self.validators = {}
+        self.cache_backend = None
+        self.response_caches = {}
+        self.compressor = None
+        self.compressed_blueprints = set()
+        self.projections = {}
+        self.spec_store = SpecStore()
+        self.spec_epoch = os.urandom(4).hex()
+        self.spec_store.listeners.append(lambda snapshot: self.doc_cache.clear())
 
         if app is not None:
             self.init_app(app, **kwargs)
 
-    def to_json(self, **kwargs):
-        return json.dumps(self.swagger, **kwargs)
+    @property
+    def swagger(self):
+        """The working spec; only change it through the spec store."""
+        return self.spec_store.spec
+
+    @property
+    def snapshot(self):
+        """The latest published, read-only :class:`SpecSnapshot`.
 
-    def to_yaml(self, **kwargs):
-        import yaml
+        Models whose documentation was deferred are added first.
+        """
+        if self._pending:
+            self.build_pending()
+        return self.spec_store.snapshot
+
+    def build_pending(self):
+        """Document every model registered since the last build."""
+        with self.spec_store.lock:
+            if not self._pending:
+                return
+            with self.spec_store.edit():
+                while self._pending:
+                    model, kwargs = self._pending.popleft()
+                    self.add_model(model, **kwargs)
+
+    def start_background_build(self):
+        """Build deferred documentation in a daemon thread, once."""
+        if self._background_build is None:
+            self._background_build = threading.Thread(
+                target=self.build_pending, name="swagger-spec-build", daemon=True
+            )
+            self._background_build.start()
+        return self._background_build
+
+    def spec_fingerprint(self):
+        """A digest of everything the shared spec is built from.
+
+        It covers the release and :data:`SPEC_FORMAT`, the ``info``
+        section and, for every registered model, the documentation
+        arguments it was registered with and its
+        :func:`~.shared.model_signature`. No model is documented or
+        introspected; mappers are configured first, as on any process's
+        first query, so attributes added by backrefs count in every
+        process alike.
+        """
+        count = len(self.registrations)
+        if self._fingerprint is None or self._fingerprint[0] != count:
+            from sqlalchemy.orm import configure_mappers
+
+            configure_mappers()
+            digest = hashlib.sha1(repr((__version__, SPEC_FORMAT)).encode())
+            for model, kwargs in self.registrations:
+                options = (
+                    kwargs.get("methods", ["GET"]),
+                    kwargs.get("url_prefix", ""),
+                    kwargs.get("collection_name"),
+                    kwargs.get("exclude_columns"),
+                    kwargs.get("bulk"),
+                    self.response_headers(kwargs),
+                    kwargs.get("default_fields"),
+                )
+                digest.update(model_signature(model).encode())
+                digest.update(repr(options).encode())
+            self._fingerprint = (count, digest)
+        digest = self._fingerprint[1].copy()
+        digest.update(
+            repr((self.url_prefix, sorted(self.swagger["info"].items()))).encode()
+        )
+        return digest.hexdigest()[:16]
+
+    def share_spec(self):
+        """Map the shared spec files into this process, writing them first
+        if no other process has.
+
+        Call it in a preloading master so workers find the files ready;
+        otherwise the first worker to serve the spec writes them.
+        """
+        fingerprint = self.spec_fingerprint()
+        shared = self.shared_spec
+        if shared is None or shared.etag != fingerprint:
+            shared = SharedSpec(self.spec_path, fingerprint)
+            shared.ensure(
+                lambda: {
+                    ".json": self._dumps(self.export_spec()),
+                    ".yaml": self.to_yaml().encode(),
+                }
+            )
+            self.shared_spec = shared
+        return shared
+
+    def export_spec(self):
+        """The spec as written to artifacts.
+
+        ``host`` and ``schemes`` are left out so clients fall back to
+        wherever the document was fetched from.
+        """
+        spec = self.snapshot.spec
+        if self.url_prefix is not None:
+            spec = dict(spec, basePath=self.url_prefix)
+        return spec
 
-        return yaml.dump(self.swagger, **kwargs)
+    @property
+    def spec_version(self):
+        """The version of the latest published spec.
+
+        It reads ``<epoch>.<generation>``: the generation grows by one with
+        every published change, and the epoch is drawn at random for each
+        manager, so a version from another process or an earlier run never
+        matches this one.
+        """
+        return self.format_version(self.snapshot.generation)
+
+    def format_version(self, generation):
+        return "%s.%d" % (self.spec_epoch, generation)
+
+    def render_changes(self, snapshot, since, host, scheme, base_path):
+        """Serialize what changed in `snapshot` after generation `since`.
+
+        Sections other than paths, definitions, parameters and responses
+        are always included in full.
+        """
+        changed, removed = changes_since(snapshot, since)
+        doc = {
+            key: value
+            for key, value in snapshot.spec.items()
+            if key not in self.spec_store.keyed_sections
+        }
+        doc.update(host=host, basePath=base_path, schemes=[scheme])
+        doc.update(changed)
+        doc["removed"] = removed
+        doc["since"] = self.format_version(since)
+        doc["version"] = self.format_version(snapshot.generation)
+        return self.render("changes", doc)
+
+    def to_json(self, backend=None, **kwargs):
+        """Serialize the spec with `backend`, defaulting to the one the
+        docs are served with; `kwargs` go to the backend's encoder.
+
+        The ``"orjson"`` backend only takes `sort_keys` and ``indent=2``
+        and raises ValueError for anything else.
+        """
+        dumps = get_json_backend(backend or self.json_backend)
+        return dumps(self.export_spec(), **kwargs).decode("utf-8")
+
+    def write_json(self, fp, **kwargs):
+        """Like :meth:`to_json`, but write to `fp` a section entry at a time."""
+        dump_json(self.export_spec(), fp, **kwargs)
+
+    def to_yaml(self, **kwargs):
+        """Serialize the spec as YAML, with libyaml when it is installed."""
+        return dump_yaml(thaw(self.export_spec()), **kwargs)
 
     def __str__(self):
-        return self.to_json(indent=4)
+        return self.to_json(backend="json", indent=4)
 
     @property
     def version(self):
@@ -79,6 +371,7 @@ class SwagAPIManager(object):
         return None
 
     @version.setter
+    @edits_spec
     def version(self, value):
         self.swagger["info"]["version"] = value
 
@@ -89,6 +382,7 @@ class SwagAPIManager(object):
         return None
 
     @title.setter
+    @edits_spec
     def title(self, value):
         self.swagger["info"]["title"] = value
 
@@ -99,105 +393,110 @@ class SwagAPIManager(object):
         return None
 
     @description.setter
+    @edits_spec
     def description(self, value):
         self.swagger["info"]["description"] = value
 
+    @edits_spec
     def add_path(self, model, **kwargs):
-        name = model.__tablename__
+        info = inspect_model(model)
+        name = str(info.table.name)
         schema = model.__name__
         path = kwargs.get("url_prefix", "") + "/" + name
         id_path = "{0}/{{{1}Id}}".format(path, schema.lower())
+        store = self.spec_store
+        store.touch("paths", path)
+        store.touch("paths", id_path)
+        headers = self.response_headers(kwargs)
+        get_params = []
+        if kwargs.get("default_fields"):
+            get_params.append(
+                store.intern(
+                    "parameters",
+                    schema + "Fields",
+                    fields_parameter(model, name, kwargs["default_fields"]),
+                )
+            )
         self.swagger["paths"][path] = {}
+        self.model_paths[schema] = (path, id_path)
+
+        id_param = store.intern(
+            "parameters",
+            schema.lower() + "Id",
+            {
+                "name": schema.lower() + "Id",
+                "in": "path",
+                "description": "ID of " + schema,
+                "required": True,
+                "type": self.id_type(info),
+            },
+        )
+        success = store.intern("responses", "Success", {"description": "Success"})
 
         for method in [m.lower() for m in kwargs.get("methods", ["GET"])]:
             if method == "get":
                 self.swagger["paths"][path][method] = {
                     "parameters": [
-                        {
-                            "name": "q",
-                            "in": "query",
-                            "description": "searchjson",
-                            "type": "string",
-                        }
-                    ],
+                        store.intern(
+                            "parameters",
+                            "q",
+                            {
+                                "name": "q",
+                                "in": "query",
+                                "description": "searchjson",
+                                "type": "string",
+                            },
+                        )
+                    ]
+                    + get_params,
                     "responses": {
                         200: {
                             "description": "List " + name,
                             "schema": {
                                 "title": name,
                                 "type": "array",
-                                "items": {"$ref": "#/definitions/" + name},
+                                "items": {"$ref": "#/definitions/" + schema},
                             },
                         }
                     },
                 }
+                if headers:
+                    self.swagger["paths"][path][method]["responses"][200][
+                        "headers"
+                    ] = headers
 
                 if model.__doc__:
                     self.swagger["paths"][path]["description"] = model.__doc__
                 if id_path not in self.swagger["paths"]:
                     self.swagger["paths"][id_path] = {}
                 self.swagger["paths"][id_path][method] = {
-                    "parameters": [
-                        {
-                            "name": schema.lower() + "Id",
-                            "in": "path",
-                            "description": "ID of " + schema,
-                            "required": True,
-                            "type": "integer",
-                        }
-                    ],
+                    "parameters": [id_param] + get_params,
                     "responses": {
                         200: {
                             "description": "Success " + name,
-                            "schema": {"$ref": "#/definitions/" + name},
+                            "schema": {"$ref": "#/definitions/" + schema},
                         }
                     },
                 }
+                if headers:
+                    self.swagger["paths"][id_path][method]["responses"][200][
+                        "headers"
+                    ] = headers
                 if model.__doc__:
                     self.swagger["paths"][id_path]["description"] = model.__doc__
             elif method == "delete":
                 if id_path not in self.swagger["paths"]:
                     self.swagger["paths"][id_path] = {}
                 self.swagger["paths"][id_path][method] = {
-                    "parameters": [
-                        {
-                            "name": schema.lower() + "Id",
-                            "in": "path",
-                            "description": "ID of " + schema,
-                            "required": True,
-                            "type": "integer",
-                        }
-                    ],
-                    "responses": {200: {"description": "Success"}},
+                    "parameters": [id_param],
+                    "responses": {200: success},
                 }
                 if model.__doc__:
                     self.swagger["paths"][id_path]["description"] = model.__doc__
             elif method == "post":
                 self.swagger["paths"][path][method] = {
-                    "parameters": [
-                        {
-                            "name": name,
-                            "in": "body",
-                            "description": schema,
-                            "type": "object",
-                            "properties": {
-                                "data": {
-                                    "type": "object",
-                                    "properties": {
-                                        "type": {
-                                            "type": "string",
-                                            "default": schema,
-                                        },
-                                        "attributes": {
-                                            "type": schema,
-                                            "$ref": "#/definitions/" + schema,
-                                        },
-                                    },
-                                }
-                            },
-                        }
-                    ],
-                    "responses": {200: {"description": "Success"}},
+                    "parameters": [self.body_param(model)],
+                    "responses": {200: success},
                 }
                 if model.__doc__:
                     self.swagger["paths"][path]["description"] = model.__doc__
@@ -205,91 +504,492 @@ class SwagAPIManager(object):
                 if id_path not in self.swagger["paths"]:
                     self.swagger["paths"][id_path] = {}
                 self.swagger["paths"][id_path][method] = {
-                    "parameters": [
-                        {
-                            "name": schema.lower() + "Id",
-                            "in": "path",
-                            "description": "ID of " + schema,
-                            "required": True,
-                            "type": "integer",
+                    "parameters": [id_param, self.body_param(model)],
+                    "responses": {200: success},
+                }
+                if model.__doc__:
+                    self.swagger["paths"][id_path]["description"] = model.__doc__
+        if kwargs.get("bulk"):
+            self.add_bulk_path(model, path + "/_bulk")
+
+    def compresses(self, kwargs):
+        """Whether the responses of a model created with `kwargs` are
+        compressed."""
+        compress = kwargs.get("compress")
+        if compress is None:
+            return self.compressor is not None
+        return bool(compress)
+
+    def response_headers(self, kwargs):
+        """The documented headers of a model's GET responses, if any."""
+        headers = {}
+        if kwargs.get("cache"):
+            headers.update(CACHE_HEADERS)
+        if self.compresses(kwargs) and self.compressor is not None:
+            headers["Content-Encoding"] = self.compressor.header()
+        return headers
+
+    def add_bulk_path(self, model, bulk_path):
+        """Document the ``_bulk`` endpoint added by ``create_api(bulk=...)``."""
+        schema = model.__name__
+        store = self.spec_store
+        store.touch("paths", bulk_path)
+        document = store.intern(
+            "definitions",
+            schema + "BulkDocument",
+            {
+                "type": "object",
+                "properties": {
+                    "data": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "type": {"type": "string", "default": schema},
+                                "attributes": {"$ref": "#/definitions/" + schema},
+                            },
                         },
-                        {
-                            "name": name,
-                            "in": "body",
-                            "description": schema,
+                    }
+                },
+            },
+        )
+        self.swagger["paths"][bulk_path] = {
+            "post": {
+                "description": "Create many %s in one transaction" % schema,
+                "parameters": [
+                    {
+                        "name": "data",
+                        "in": "body",
+                        "required": True,
+                        "schema": document,
+                    }
+                ],
+                "responses": {
+                    201: {
+                        "description": "Number of " + schema + " created",
+                        "schema": {
                             "type": "object",
                             "properties": {
-                                "data": {
+                                "meta": {
                                     "type": "object",
-                                    "properties": {
-                                        "id": {
-                                            "type": "string",
-                                            "default": "",
-                                        },
-                                        "type": {
-                                            "type": "string",
-                                            "default": schema,
-                                        },
-                                        "attributes": {
-                                            "type": schema,
-                                            "$ref": "#/definitions/" + schema,
-                                        },
-                                    },
+                                    "properties": {"created": {"type": "integer"}},
                                 }
                             },
                         },
-                    ],
-                    "responses": {200: {"description": "Success"}},
+                    },
+                    400: {"description": "A resource is invalid; nothing was created"},
+                    409: {"description": "The insert failed; nothing was created"},
+                },
+            }
+        }
+
+    def id_type(self, info):
+        """The swagger type of the id in a resource URL of `info`'s model."""
+        if len(info.primary_key) != 1:
+            return "string"
+        id_type = self.type_resolver.resolve(info.primary_key[0].type)["type"]
+        return id_type if id_type in ("integer", "number") else "string"
+
+    def body_param(self, model):
+        """The JSON:API request body of `model`, shared by POST and PATCH."""
+        schema = model.__name__
+        envelope = {
+            "type": "object",
+            "properties": {
+                "data": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "type": {"type": "string", "default": schema},
+                        "attributes": {"$ref": "#/definitions/" + schema},
+                    },
                 }
-                if model.__doc__:
-                    self.swagger["paths"][id_path]["description"] = model.__doc__
+            },
+        }
+        return self.spec_store.intern(
+            "parameters",
+            schema + "Body",
+            {
+                "name": model.__tablename__,
+                "in": "body",
+                "description": schema,
+                "required": True,
+                "schema": self.spec_store.intern(
+                    "definitions", schema + "Document", envelope
+                ),
+            },
+        )
 
+    @edits_spec
     def add_defn(self, model, **kwargs):
         name = model.__name__
-        self.swagger["definitions"][name] = {"type": "object", "properties": {}}
-        columns = get_columns(model).keys()
-        for column_name, column in get_columns(model).items():
-            if column_name in kwargs.get("exclude_columns", []):
+        self.spec_store.reserve("definitions", name)
+        self.spec_store.touch("definitions", name)
+        self.swagger["definitions"][name] = self.model_definition(model, **kwargs)
+
+    def model_definition(self, model, **kwargs):
+        """Build the swagger definition of `model` without storing it."""
+        defn = {"type": "object", "properties": {}}
+        properties = defn["properties"]
+        required = []
+        info = inspect_model(model)
+        indexed = indexed_columns(info.table)
+        exclude = kwargs.get("exclude_columns", [])
+
+        for attr in info.columns:
+            if attr.name == "id" or attr.name in exclude:
                 continue
-            try:
-                column_type = str(column.type)
-                if "(" in column_type:
-                    column_type = column_type.split("(")[0]
-
-                column_defn = sqlalchemy_swagger_type[column_type]
-                # date and datetime
-                if column_defn in ["date", "date-time"]:
-                    column_defn = {"type": "string", "format": column_defn}
-                else:
-                    column_defn = {"type": column_defn}
-
-            except AttributeError:
-                schema = get_related_model(model, column_name)
-                if column_name + "_id" in columns:
-                    column_defn = {"schema": {"$ref": schema.__name__}}
-                else:
-                    column_defn = {
-                        "schema": {"type": "array", "items": {"$ref": schema.__name__}}
-                    }
+            column = attr.column
+            column_defn = self.property_definition(column.type)
+            if is_table_column(column):
+                if is_required(column):
+                    required.append(attr.name)
+                if column.name in indexed:
+                    column_defn["x-indexed"] = True
+            else:
+                column_defn["readOnly"] = True
+            if attr.doc:
+                column_defn["description"] = attr.doc
+            properties[attr.name] = column_defn
+
+        for hybrid in info.hybrids:
+            if hybrid.name in exclude:
+                continue
+            column_defn = self.property_definition(hybrid.type)
+            if not hybrid.writable:
+                column_defn["readOnly"] = True
+            if hybrid.doc:
+                column_defn["description"] = hybrid.doc
+            properties[hybrid.name] = column_defn
+
+        for proxy in info.proxies:
+            if proxy.name in exclude:
+                continue
+            column_defn = self.property_definition(proxy.type)
+            if not proxy.scalar:
+                column_defn = {"type": "array", "items": column_defn}
+            if proxy.doc:
+                column_defn["description"] = proxy.doc
+            properties[proxy.name] = column_defn
+
+        relationships = {
+            rel.name: {
+                "model": rel.target.__name__,
+                "direction": rel.direction,
+                "uselist": rel.uselist,
+            }
+            for rel in info.relationships
+            if rel.name not in exclude
+        }
+        if required:
+            defn["required"] = required
+        if relationships:
+            defn["x-relationships"] = relationships
+        return defn
+
+    def property_definition(self, column_type):
+        """The swagger property of a value of SQL type `column_type`."""
+        if column_type is None:
+            return dict(self.type_resolver.default)
+        column_defn = self.type_resolver.resolve(column_type)
+        if column_defn["type"] == "string":
+            if getattr(column_type, "length", None):
+                column_defn["maxLength"] = column_type.length
+            if getattr(column_type, "enums", None):
+                column_defn["enum"] = list(column_type.enums)
+        return column_defn
 
-            if column.__doc__:
-                column_defn["description"] = column.__doc__
-            self.swagger["definitions"][name]["properties"][column_name] = column_defn
+    @edits_spec
+    def add_model(self, model, **kwargs):
+        """Document `model` without creating an API for it.
 
-    def init_app(self, app, doc_prefix="/dbdoc", url_prefix="/db", **kwargs):
+        Readers see the new definition and paths together.
+        """
+        if not self.hooks:
+            self.add_defn(model, **kwargs)
+            self.add_path(model, **kwargs)
+        else:
+            started = time.perf_counter()
+            self.add_defn(model, **kwargs)
+            defined = time.perf_counter()
+            self.add_path(model, **kwargs)
+            self.hooks.emit(
+                "model_documented",
+                model=model,
+                columns=len(self.swagger["definitions"][model.__name__]["properties"]),
+                defn_seconds=defined - started,
+                path_seconds=time.perf_counter() - defined,
+            )
+        self.fragment_cache.discard(model.__name__)
+
+    def render_fragment(self, name):
+        """The cached fragment document of model `name`, or None."""
+        snapshot = self.snapshot
+        paths = self.model_paths.get(name)
+        if paths is None or name not in snapshot.spec["definitions"]:
+            return None
+        stamp = tuple(
+            snapshot.changed.get(key, 0)
+            for key in [("definitions", name)] + [("paths", path) for path in paths]
+        )
+        cached = self.fragment_cache.get(name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        fragment = build_fragment(snapshot.spec, name, paths, self.model_paths)
+        fragment["basePath"] = self.url_prefix
+        rendered = self.render("fragment", fragment)
+        self.fragment_cache.put(name, (stamp, rendered))
+        return rendered
+
+    def render(self, document, doc, format="json"):
+        """Serialize `doc` into a :class:`RenderedDoc`."""
+        started = time.perf_counter() if self.hooks else None
+        if format == "yaml":
+            rendered = RenderedDoc(dump_yaml(thaw(doc)), mimetype="application/yaml")
+        else:
+            rendered = RenderedDoc(self._dumps(doc))
+        if started is None:
+            return rendered
+        self.hooks.emit(
+            "doc_rendered",
+            document=document,
+            seconds=time.perf_counter() - started,
+            size=len(rendered.body),
+        )
+        return rendered
+
+    def render_doc(self, spec, host, scheme, base_path, format="json"):
+        """Serialize `spec` as served to clients of `host`."""
+        doc = dict(spec, host=host, basePath=base_path, schemes=[scheme])
+        return self.render("spec", doc, format)
+
+    def served(self, document, response):
+        if self.hooks:
+            self.hooks.emit(
+                "doc_served", document=document, status=response.status_code
+            )
+        return response
+
+    def init_app(
+        self,
+        app,
+        doc_prefix="/dbdoc",
+        url_prefix="/db",
+        doc_cache_size=16,
+        spec_build="eager",
+        spec_artifact=None,
+        stream_doc=False,
+        stats=False,
+        json_backend="json",
+        cache_ui_assets=False,
+        spec_path=None,
+        cache_backend=None,
+        fast_start=False,
+        metrics=False,
+        metrics_path="/metrics",
+        metrics_clients=(),
+        compression=False,
+        **kwargs,
+    ):
+        """Set up the API manager and the documentation routes on `app`.
+
+        `spec_build` controls when models are documented: ``"eager"`` does
+        it in :meth:`create_api`, ``"lazy"`` waits for the first read of
+        the spec and ``"background"`` starts a thread on the first request
+        the application serves.
+
+        If `spec_artifact` names a JSON file written by ``flask swagger
+        build``, that file is served as the spec and models are only
+        introspected when the spec is built in-process, e.g. by that
+        command. A relative `spec_artifact` is resolved against
+        ``app.root_path``, as is the output of ``flask swagger build``.
+
+        ``spec_build="shared"`` is meant for pre-fork servers: the spec is
+        built by a single process, written as JSON and YAML next to
+        `spec_path` (by default ``dbdoc.json`` in the instance folder) and
+        served by every process from memory maps of those files; see
+        :meth:`share_spec`. The index and model fragments are not served
+        in that mode, and ``since`` is answered with the whole document.
+
+        With `stream_doc` the spec is not cached but streamed to each
+        client with chunked transfer encoding, which keeps memory flat for
+        very large schemas.
+
+        `stats` connects a :class:`SpecStats` to :attr:`hooks` and reports
+        it as JSON at ``<doc_prefix>/_stats``.
+
+        `json_backend` names the entry of
+        :data:`~flask_restless_swagger.serialize.json_backends` used for
+        the doc routes and :meth:`to_json`, e.g. ``"orjson"``.
+
+        `cache_backend` stores the responses of models created with
+        ``cache=...``; it defaults to an in-process
+        :class:`~flask_restless_swagger.response_cache.MemoryBackend`.
+
+        `cache_ui_assets` serves the Swagger UI files under content-hashed
+        names with immutable caching and precompressed gzip variants.
+
+        `metrics` times every request and labels it with the swagger path
+        template it matched. :attr:`metrics` is served as Prometheus text
+        at `metrics_path` only to the addresses or networks listed in
+        `metrics_clients`, e.g. ``("10.0.0.0/8",)``; by default the route
+        is not added, and ``metrics.render()`` can be served from a
+        separate, private app instead. Behind a reverse proxy every
+        request arrives from the proxy's address, so only list addresses
+        that do not proxy public traffic.
+
+        `compression` compresses the responses of the generated endpoints
+        for clients that accept it; pass a
+        :class:`~flask_restless_swagger.compression.ResponseCompressor` to
+        choose the codings and size thresholds. ``create_api(...,
+        compress=False)`` opts a model out, ``compress=True`` in.
+
+        With `fast_start` the Swagger UI routes are added as plain views
+        that import flask-swagger-ui and set the UI up on their first
+        request, so processes that never serve the UI skip that work.
+        """
+        if spec_build not in SPEC_BUILD_MODES:
+            raise ValueError("spec_build must be one of %s" % (SPEC_BUILD_MODES,))
+        self._dumps = get_json_backend(json_backend, compact=True)
+        self.json_backend = json_backend
         self.app = app
+        from flask_restless import APIManager
+
         self.manager = APIManager(self.app, url_prefix=url_prefix, **kwargs)
+        self.url_prefix = url_prefix
+        self.doc_cache.maxsize = doc_cache_size
+        self.cache_backend = cache_backend
+        if compression:
+            self.compressor = (
+                compression
+                if isinstance(compression, ResponseCompressor)
+                else ResponseCompressor()
+            )
+        self.spec_build = spec_build
+        if spec_build == "shared":
+            self.spec_path = spec_path or os.path.join(app.instance_path, "dbdoc.json")
+        app.extensions["swagger"] = self
+        app.cli.add_command(swagger_cli)
+
+        if metrics:
+            self.init_metrics(app, metrics_path, metrics_clients)
+
+        if spec_artifact is not None:
+            self.spec_artifact = os.path.join(app.root_path, spec_artifact)
+
+        if spec_build == "background":
+
+            @app.before_request
+            def start_spec_build():
+                if self._background_build is None:
+                    self.start_background_build()
+
+        if stats:
+            self.stats = SpecStats().connect(self.hooks)
+
+            @app.route(f"{doc_prefix}/_stats")
+            def doc_stats():
+                return jsonify(self.stats.report())
 
         @app.route(f"{doc_prefix}.json")
         def doc_json():
+            if self.spec_artifact is not None:
+                response = self.artifact_response(
+                    self.spec_artifact, "application/json"
+                )
+                return self.served("spec", response)
+            if self.spec_build == "shared":
+                # The whole document, also for ``since``: the file may
+                # have been written by another process.
+                return self.served("spec", self.share_spec().make_response(request))
+
             # I can only get this from a request context
-            self.swagger["host"] = urlparse.urlparse(request.url_root).netloc
-            self.swagger["basePath"] = url_prefix
-            self.swagger["schemes"] = (request.scheme,)
-            return jsonify(self.swagger)
+            host = urlparse.urlparse(request.url_root).netloc
+            snapshot = self.snapshot
+            if stream_doc:
+                doc = dict(
+                    snapshot.spec,
+                    host=host,
+                    basePath=url_prefix,
+                    schemes=[request.scheme],
+                )
+                response = Response(iter_json(doc), mimetype="application/json")
+                return self.served("spec", response)
+
+            since = request.args.get("since")
+            if since is not None:
+                epoch, _, since = since.rpartition(".")
+                try:
+                    since = int(since)
+                except ValueError:
+                    abort(400)
+                if epoch != self.spec_epoch:
+                    # Issued by another process or run: send everything.
+                    since = None
+                elif not 0 <= since <= snapshot.generation:
+                    abort(400)
+            if since is not None:
+                key = ("since", since, snapshot.generation, host, request.scheme)
+                rendered = self.doc_cache.get(key)
+                if rendered is None:
+                    rendered = self.render_changes(
+                        snapshot, since, host, request.scheme, url_prefix
+                    )
+                    self.doc_cache.put(key, rendered)
+                document = "changes"
+            else:
+                key = (snapshot.generation, host, request.scheme, url_prefix)
+                rendered = self.doc_cache.get(key)
+                if rendered is None:
+                    rendered = self.render_doc(snapshot.spec, *key[1:])
+                    self.doc_cache.put(key, rendered)
+                document = "spec"
+
+            response = rendered.make_response(request)
+            response.headers["X-Spec-Version"] = self.format_version(
+                snapshot.generation
+            )
+            return self.served(document, response)
+
+        @app.route(f"{doc_prefix}.yaml")
+        def doc_yaml():
+            if self.spec_artifact is not None:
+                yaml_artifact = os.path.splitext(self.spec_artifact)[0] + ".yaml"
+                response = self.artifact_response(yaml_artifact, "application/yaml")
+                return self.served("yaml", response)
+            if self.spec_build == "shared":
+                response = self.share_spec().make_response(request, ".yaml")
+                return self.served("yaml", response)
+
+            host = urlparse.urlparse(request.url_root).netloc
+            snapshot = self.snapshot
+            key = ("yaml", snapshot.generation, host, request.scheme, url_prefix)
+            rendered = self.doc_cache.get(key)
+            if rendered is None:
+                rendered = self.render_doc(snapshot.spec, *key[2:], format="yaml")
+                self.doc_cache.put(key, rendered)
+            return self.served("yaml", rendered.make_response(request))
+
+        if self.spec_artifact is None and spec_build != "shared":
+            self.init_fragment_routes(app, doc_prefix, url_prefix)
 
         # /dbdoc
-        doc_blueprint = get_swaggerui_blueprint(
+        if fast_start:
+            show_ui = lazy_swaggerui_view(
+                doc_prefix,
+                f"{doc_prefix}.json",
+                config={"app_name": "DB API"},
+                cache_assets=cache_ui_assets,
+            )
+            app.add_url_rule(f"{doc_prefix}/", "swagger_ui", show_ui)
+            app.add_url_rule(f"{doc_prefix}/<path:path>", "swagger_ui", show_ui)
+            return
+
+        if cache_ui_assets:
+            make_blueprint = swaggerui_blueprint
+        else:
+            from flask_swagger_ui import get_swaggerui_blueprint as make_blueprint
+        doc_blueprint = make_blueprint(
             f"{doc_prefix}",  # Swagger UI static files will be mapped to '{SWAGGER_URL}/dist/'
             f"{doc_prefix}.json",
             config={"app_name": "DB API"},  # Swagger UI config overrides
@@ -297,10 +997,277 @@ class SwagAPIManager(object):
 
         app.register_blueprint(doc_blueprint)
 
+    def apply_default_fields(self):
+        """``before_request`` hook of models created with ``default_fields``."""
+        if request.method == "GET":
+            projection = self.projections.get(request.endpoint)
+            if projection is not None:
+                projection.apply()
+
+    def compress_response(self, response):
+        """``after_request`` hook of models whose responses are compressed."""
+        if request.blueprint in self.compressed_blueprints:
+            return self.compressor.compress(request, response)
+        return response
+
+    def init_fragment_routes(self, app, doc_prefix, url_prefix):
+        """Serve the index and per-model fragments of the spec.
+
+        They are built from the in-process spec, so they are not served
+        from a prebuilt artifact or with ``spec_build="shared"``, where
+        that would introspect every model in every process.
+        """
+
+        @app.route(f"{doc_prefix}/index.json")
+        def doc_index():
+            snapshot = self.snapshot
+            key = ("index", snapshot.generation, url_prefix)
+            rendered = self.doc_cache.get(key)
+            if rendered is None:
+                index = build_index(snapshot.spec, self.model_paths)
+                index["basePath"] = url_prefix
+                rendered = self.render("index", index)
+                self.doc_cache.put(key, rendered)
+            return self.served("index", rendered.make_response(request))
+
+        @app.route(f"{doc_prefix}/models/<name>.json")
+        def doc_fragment(name):
+            rendered = self.render_fragment(name)
+            if rendered is None:
+                abort(404)
+            return self.served("fragment", rendered.make_response(request))
+
+    def artifact_response(self, path, mimetype):
+        """Send the artifact at `path`, or 404 if it has not been built.
+
+        Its ETag is computed on first use, so the application can be
+        loaded before the artifact exists, e.g. by ``flask swagger build``,
+        and again whenever the file's mtime or size change.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            abort(404)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._artifact_etags.get(path)
+        if cached is None or cached[0] != stamp:
+            with open(path, "rb") as f:
+                cached = (stamp, hashlib.sha1(f.read()).hexdigest())
+            self._artifact_etags[path] = cached
+        return send_file(path, mimetype=mimetype, etag=cached[1], conditional=True)
+
+    def init_metrics(self, app, metrics_path, clients=()):
+        """Record request metrics on `app` and serve them at `metrics_path`
+        to `clients`, if any.
+
+        The timing hook is registered before any other, so responses
+        served early by another ``before_request`` hook are timed too.
+        """
+        self.metrics = metrics = Metrics()
+        networks = [ipaddress.ip_network(client) for client in clients]
+
+        @app.before_request
+        def start_timer():
+            request.environ["restless.started"] = time.perf_counter()
+
+        @app.after_request
+        def observe_request(response):
+            started = request.environ.get("restless.started")
+            rule = request.url_rule
+            if started is None or (rule is not None and rule.rule == metrics_path):
+                return response
+            metrics.observe(
+                request.method,
+                metrics.routes.template(rule.rule) if rule is not None else "unmatched",
+                response.status_code,
+                time.perf_counter() - started,
+            )
+            return response
+
+        if not networks:
+            return
+
+        @app.route(metrics_path)
+        def request_metrics():
+            try:
+                address = ipaddress.ip_address(request.remote_addr)
+            except ValueError:
+                abort(404)
+            if not any(address in network for network in networks):
+                abort(404)
+            return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
     def create_api(self, model, **kwargs):
-        self.manager.create_api(model, **kwargs)
-        self.add_defn(model, **kwargs)
-        self.add_path(model, **kwargs)
+        """Create the API of `model` and document it.
+
+        Besides the Flask-Restless arguments this accepts `exclude_columns`,
+        attributes left out of the documentation, and `validate`: when
+        true, the model definition is compiled into a validator that
+        rejects malformed POST and PATCH bodies before any database work.
+
+        `query_guard` (``"warn"`` or ``"reject"``) checks collection
+        requests for filters and sorts on columns that lead no index.
+
+        `bulk` adds ``POST <collection>/_bulk``, which inserts a list of
+        resources in one transaction after running the model's
+        ``POST_RESOURCE`` preprocessors on each; pass a number instead of
+        ``True`` to set the rows per ``executemany`` batch. It needs
+        ``"POST"`` in `methods`. The rows are inserted without loading
+        instances, so ``POST_RESOURCE`` postprocessors are not run for
+        them.
+
+        `cache` caches the responses of the collection and item GET
+        endpoints until the model is written through the API or for at
+        most that many seconds (60 with ``True``).
+        """
+        if kwargs.get("bulk") and "POST" not in {
+            method.upper() for method in kwargs.get("methods", ["GET"])
+        }:
+            raise ValueError('bulk needs "POST" in methods of %s' % model.__name__)
+        started = time.perf_counter() if self.hooks else None
+        api_kwargs = {k: v for k, v in kwargs.items() if k not in SWAGGER_OPTIONS}
+        if kwargs.get("validate"):
+            # exclude_columns only hides attributes from the docs; they
+            # can still be written.
+            validator = compile_validator(
+                self.model_definition(model), "validate_" + model.__name__
+            )
+            self.validators[model] = validator
+            api_kwargs = merge_processors(
+                api_kwargs, "preprocessors", validation_preprocessors(validator)
+            )
+        if kwargs.get("query_guard"):
+            guard = query_guard_preprocessor(
+                model, indexed_columns(model.__table__), kwargs["query_guard"]
+            )
+            api_kwargs = merge_processors(
+                api_kwargs, "preprocessors", {"GET_COLLECTION": [guard]}
+            )
+        cache = None
+        if kwargs.get("cache"):
+            if self.cache_backend is None:
+                self.cache_backend = MemoryBackend()
+            if not self.response_caches:
+                self.app.register_error_handler(CacheHit, lambda hit: hit.response)
+            ttl = DEFAULT_TTL if kwargs["cache"] is True else kwargs["cache"]
+            namespace = "%s/%s" % (
+                api_kwargs.get("url_prefix") or self.url_prefix,
+                api_kwargs.get("collection_name") or model.__table__.name,
+            )
+            cache = ResponseCache(self.cache_backend, namespace, ttl)
+            api_kwargs = merge_processors(
+                api_kwargs, "preprocessors", lookup_preprocessors(cache), last=True
+            )
+            api_kwargs = merge_processors(
+                api_kwargs, "postprocessors", invalidation_postprocessors(cache)
+            )
+        projection = None
+        if kwargs.get("default_fields"):
+            projection = Projection(
+                model,
+                api_kwargs.get("collection_name") or model.__table__.name,
+                kwargs["default_fields"],
+            )
+        self.manager.create_api(model, **api_kwargs)
+        # The request hooks of these features are added with their first
+        # model, so applications that do not use them pay nothing.
+        if projection is not None and not self.projections:
+            self.app.before_request(self.apply_default_fields)
+            listen_for_projections(self.manager.session)
+        if self.compresses(kwargs) and not self.compressed_blueprints:
+            self.app.after_request(self.compress_response)
+        if cache is not None or projection is not None:
+            api = self.manager.created_apis_for[model]
+            for view in ("get_collection", "get_resource"):
+                endpoint = "%s.%s_%s" % (api.blueprint_name, api.collection_name, view)
+                if cache is not None:
+                    self.response_caches[endpoint] = cache
+                if projection is not None:
+                    self.projections[endpoint] = projection
+        if self.compresses(kwargs):
+            if self.compressor is None:
+                self.compressor = ResponseCompressor()
+            api = self.manager.created_apis_for[model]
+            self.compressed_blueprints.add(api.blueprint_name)
+        if self.metrics is not None:
+            api = self.manager.created_apis_for[model]
+            prefix = api_kwargs.get("url_prefix") or self.url_prefix
+            base = "%s/%s" % (prefix, api.collection_name)
+            self.metrics.routes.add(base, base)
+            self.metrics.routes.add(
+                base + "/<resource_id>", "%s/{%sId}" % (base, model.__name__.lower())
+            )
+        if kwargs.get("bulk"):
+            self.add_bulk_endpoint(
+                model,
+                invalidate=cache.invalidate if cache is not None else None,
+                **kwargs,
+            )
+        self.registrations.append((model, kwargs))
+        if self.spec_build == "eager" and self.spec_artifact is None:
+            self.add_model(model, **kwargs)
+        else:
+            self._pending.append((model, kwargs))
+        if started is not None:
+            self.hooks.emit(
+                "api_created", model=model, seconds=time.perf_counter() - started
+            )
+
+    def add_bulk_endpoint(self, model, invalidate=None, **kwargs):
+        """Register the bulk creation endpoint of `model` on the app."""
+        bulk = kwargs["bulk"]
+        chunk_size = DEFAULT_CHUNK_SIZE if bulk is True else int(bulk)
+        definition = self.model_definition(model)
+        validate = self.validators.get(model)
+        if validate is None:
+            validate = compile_validator(definition, "validate_" + model.__name__)
+        api = self.manager.created_apis_for[model]
+        # The validator above replaces the validation preprocessor.
+        preprocessors = list(self.manager.pre.get("POST_RESOURCE", []))
+        preprocessors += (kwargs.get("preprocessors") or {}).get("POST_RESOURCE", [])
+        view = bulk_view(
+            model,
+            self.manager.session,
+            definition,
+            validate,
+            api.collection_name,
+            chunk_size,
+            invalidate,
+            preprocessors,
+        )
+        # Named like the API's own endpoints, so registering the model
+        # again under another url_prefix adds a second endpoint.
+        self.app.add_url_rule(
+            "%s/%s/_bulk"
+            % (kwargs.get("url_prefix") or self.url_prefix, api.collection_name),
+            endpoint="%s.%s_bulk" % (api.blueprint_name, api.collection_name),
+            view_func=view,
+            methods=["POST"],
+        )
+
+    def create_apis(self, models_or_base, common=None, **per_model_overrides):
+        """Create APIs for many models in one pass.
+
+        `models_or_base` is a declarative base, whose registry is walked
+        once, or an iterable of models. Every model gets the keyword
+        arguments in `common`, updated with the dict passed as the keyword
+        argument named after the model class, if any; pass ``None`` there
+        to skip a model. The spec is published once, after the last model.
+
+        Returns the list of models APIs were created for.
+        """
+        created = []
+        with self.spec_store.edit():
+            for model in iter_models(models_or_base):
+                kwargs = dict(common or {})
+                if model.__name__ in per_model_overrides:
+                    override = per_model_overrides[model.__name__]
+                    if override is None:
+                        continue
+                    kwargs.update(override)
+                self.create_api(model, **kwargs)
+                created.append(model)
+        return created
 
     def swagger_blueprint(self):
         return swagger
@@ -0,0 +1,164 @@
+"""
+Bulk creation endpoints.
+
+``POST <collection>/_bulk`` takes a JSON:API document whose ``data`` is a
+list of resources, validates all of them and inserts them in chunked
+``executemany`` batches inside one transaction. The model's
+``POST_RESOURCE`` preprocessors run for every resource first, as they
+would for one POST each; its postprocessors do not run, as no instance
+is loaded to build their result from.
+"""
+
+import datetime
+import json
+
+from flask import Response, request
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.http import HTTP_STATUS_CODES
+
+from .introspection import inspect_model
+
+JSONAPI = "application/vnd.api+json"
+
+#: Rows per ``executemany`` batch when ``bulk=True``.
+DEFAULT_CHUNK_SIZE = 500
+
+PARSERS = {
+    "date": datetime.date.fromisoformat,
+    "date-time": datetime.datetime.fromisoformat,
+    "time": datetime.time.fromisoformat,
+}
+
+
+def error_response(status, title, detail, pointer=None):
+    error = {"status": str(status), "title": title, "detail": detail}
+    if pointer is not None:
+        error["source"] = {"pointer": pointer}
+    return Response(json.dumps({"errors": [error]}), status=status, mimetype=JSONAPI)
+
+
+def batches(rows):
+    """Split `rows` into runs with the same keys, as ``executemany`` needs.
+
+    Leaving a key out must keep the column default, so rows are not
+    padded with ``None``.
+    """
+    groups = {}
+    for values in rows:
+        groups.setdefault(frozenset(values), []).append(values)
+    return groups.values()
+
+
+def preprocess(preprocessors, resource, index):
+    """Run ``POST_RESOURCE`` `preprocessors` on one resource of a bulk
+    request, as if it had been POSTed alone.
+
+    Returns the resource, which the preprocessors may have replaced, and
+    an error response if one of them raised ``ProcessingException``.
+    """
+    from flask_restless import ProcessingException
+
+    document = {"data": resource}
+    try:
+        for preprocessor in preprocessors:
+            preprocessor(data=document)
+    except ProcessingException as e:
+        pointer = (e.source or {}).get("pointer")
+        if pointer is not None and pointer.startswith("/data"):
+            pointer = "/data/%d%s" % (index, pointer[len("/data") :])
+        title = e.title or HTTP_STATUS_CODES.get(e.status, "Error")
+        return resource, error_response(e.status, title, e.detail or title, pointer)
+    return document.get("data"), None
+
+
+def bulk_view(
+    model,
+    session,
+    definition,
+    validate,
+    type_name,
+    chunk_size,
+    invalidate=None,
+    preprocessors=(),
+):
+    """The view function of `model`'s bulk endpoint.
+
+    `validate` is a compiled validator of `definition` (see
+    :func:`~flask_restless_swagger.validation.compile_validator`),
+    `preprocessors` are the model's ``POST_RESOURCE`` preprocessors and
+    `invalidate` is called once the rows are committed.
+    """
+    columns = {attr.name: attr.column.key for attr in inspect_model(model).columns}
+    parsers = {
+        name: PARSERS[schema["format"]]
+        for name, schema in definition.get("properties", {}).items()
+        if schema.get("format") in PARSERS and name in columns
+    }
+    statement = insert(model.__table__)
+
+    def row(attributes):
+        values = {}
+        for name, value in attributes.items():
+            if name in parsers and isinstance(value, str):
+                value = parsers[name](value)
+            values[columns.get(name, name)] = value
+        return values
+
+    def create_bulk():
+        document = request.get_json(force=True, silent=True)
+        resources = document.get("data") if isinstance(document, dict) else None
+        if not isinstance(resources, list):
+            return error_response(
+                400,
+                "Invalid request body",
+                "The request body must contain a 'data' array",
+                "/data",
+            )
+
+        rows = []
+        for i, resource in enumerate(resources):
+            if preprocessors:
+                resource, error = preprocess(preprocessors, resource, i)
+                if error is not None:
+                    return error
+            if not isinstance(resource, dict) or resource.get("type") != type_name:
+                return error_response(
+                    409,
+                    "Type mismatch",
+                    "Every resource must be of type %r" % type_name,
+                    "/data/%d/type" % i,
+                )
+            attributes = resource.get("attributes", {})
+            errors = validate(attributes, False)
+            if errors:
+                attribute, message = errors[0]
+                return error_response(
+                    400,
+                    "Invalid attribute",
+                    "; ".join("%s %s" % error for error in errors),
+                    "/data/%d/attributes/%s" % (i, attribute),
+                )
+            try:
+                rows.append(row(attributes))
+            except ValueError as e:
+                return error_response(
+                    400, "Invalid attribute", str(e), "/data/%d/attributes" % i
+                )
+
+        try:
+            for start in range(0, len(rows), chunk_size):
+                for batch in batches(rows[start : start + chunk_size]):
+                    session.execute(statement, batch)
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            detail = str(getattr(e, "orig", None) or e)
+            return error_response(409, "Bulk insert failed", detail)
+        if invalidate is not None:
+            invalidate()
+
+        body = json.dumps({"meta": {"created": len(rows)}})
+        return Response(body, status=201, mimetype=JSONAPI)
+
+    return create_bulk
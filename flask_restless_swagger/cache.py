@@ -0,0 +1,83 @@
+"""
+Rendered document cache for the swagger views.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+
+class RenderedDoc(object):
+    """A serialized document, ready to be sent as-is.
+
+    The body is kept both as plain bytes and gzip-compressed, so serving
+    a request never touches the spec dicts or the compressor.
+    """
+
+    __slots__ = ("body", "gzip_body", "etag", "mimetype")
+
+    def __init__(self, body, mimetype="application/json"):
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.mimetype = mimetype
+
+    def make_response(self, request):
+        """Build a response for `request`, honouring ``If-None-Match``
+        and ``Accept-Encoding``."""
+        use_gzip = "gzip" in request.accept_encodings
+        if use_gzip:
+            body, etag = self.gzip_body, self.etag + "-gz"
+        else:
+            body, etag = self.body, self.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if use_gzip:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+class RenderCache(object):
+    """A small thread-safe LRU of :class:`RenderedDoc` objects."""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return None
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,117 @@
+"""
+``flask swagger`` command line interface.
+"""
+
+import json
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+swagger_cli = AppGroup("swagger", help="Swagger documentation commands.")
+
+
+def get_manager():
+    try:
+        return current_app.extensions["swagger"]
+    except KeyError:
+        raise click.UsageError("The application has no SwagAPIManager.")
+
+
+@swagger_cli.command("build")
+@click.option(
+    "--output",
+    "-o",
+    default=None,
+    help="Artifact path without extension; .json and .yaml are appended. "
+    "Relative paths are resolved against the application root. Defaults to "
+    "the configured spec_artifact, or dbdoc.",
+)
+@click.option("--json/--no-json", "write_json", default=True, show_default=True)
+@click.option("--yaml/--no-yaml", "write_yaml", default=True, show_default=True)
+def build(output, write_json, write_yaml):
+    """Write the complete spec of the application to disk."""
+    manager = get_manager()
+    if output is None:
+        if manager.spec_artifact is not None:
+            output = os.path.splitext(manager.spec_artifact)[0]
+        else:
+            output = "dbdoc"
+    output = os.path.join(current_app.root_path, output)
+    manager.build_pending()
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if write_json:
+        with open(output + ".json", "w") as f:
+            f.write(manager.to_json(sort_keys=True))
+        click.echo("Wrote %s.json" % output)
+    if write_yaml:
+        with open(output + ".yaml", "w") as f:
+            f.write(manager.to_yaml(default_flow_style=False))
+        click.echo("Wrote %s.yaml" % output)
+
+
+@swagger_cli.command("loadtest")
+@click.option(
+    "--requests", "-n", default=1000, show_default=True, help="Requests to send."
+)
+@click.option("--threads", "-t", default=4, show_default=True, help="Worker threads.")
+@click.option("--rows", default=100, show_default=True, help="Seed rows per model.")
+@click.option(
+    "--mix",
+    default="get=70,post=10,patch=15,delete=5",
+    show_default=True,
+    help="Relative weights of the HTTP methods.",
+)
+@click.option("--seed", default=0, show_default=True, help="Random seed.")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+def loadtest(requests, threads, rows, mix, seed, as_json):
+    """Replay synthetic traffic against a scratch SQLite copy of the APIs."""
+    from .loadtest import parse_mix, run_load
+
+    try:
+        mix = parse_mix(mix)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--mix")
+    result = run_load(
+        get_manager(), rows=rows, requests=requests, threads=threads, mix=mix, seed=seed
+    )
+    if as_json:
+        click.echo(json.dumps(result, indent=2))
+        return
+
+    click.echo(
+        "%d requests in %.2fs (%.1f req/s)"
+        % (result["requests"], result["seconds"], result["throughput"])
+    )
+    width = max([len(key) for key in result["endpoints"]] + [8])
+    click.echo(
+        "%-*s %8s %6s %9s %8s %8s %8s"
+        % (
+            width,
+            "endpoint",
+            "requests",
+            "errors",
+            "req/s",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+        )
+    )
+    for key, endpoint in result["endpoints"].items():
+        click.echo(
+            "%-*s %8d %6d %9.1f %8.2f %8.2f %8.2f"
+            % (
+                width,
+                key,
+                endpoint["requests"],
+                endpoint["errors"],
+                endpoint["throughput"],
+                endpoint["p50_ms"],
+                endpoint["p95_ms"],
+                endpoint["p99_ms"],
+            )
+        )
@@ -0,0 +1,89 @@
+"""
+Mapping of SQLAlchemy column types onto swagger types and formats.
+"""
+
+import threading
+
+from sqlalchemy import types as sa_types
+
+
+class TypeResolver(object):
+    """Resolve SQLAlchemy types to swagger property definitions.
+
+    Mappings are registered against SQLAlchemy type classes and looked up
+    along the MRO of a column's type, so dialect types, subclasses and
+    :class:`~sqlalchemy.types.TypeDecorator` implementations pick up the
+    mapping of their nearest registered ancestor. The result is memoized
+    per type class.
+    """
+
+    def __init__(self, default=None):
+        self.default = default or {"type": "string"}
+        self._registry = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def register(self, type_class, type, format=None, **extra):
+        """Map `type_class` and its subclasses onto a swagger `type`.
+
+        Any `extra` keyword arguments are copied into the property
+        definition as-is.
+        """
+        defn = {"type": type}
+        if format is not None:
+            defn["format"] = format
+        defn.update(extra)
+        with self._lock:
+            self._registry[type_class] = defn
+            self._cache.clear()
+
+    def resolve(self, column_type):
+        """Return a new property definition for `column_type`.
+
+        `column_type` may be a type instance or a type class.
+        """
+        type_class = column_type if isinstance(column_type, type) else type(column_type)
+        try:
+            defn = self._cache[type_class]
+        except KeyError:
+            defn = self._cache[type_class] = self._lookup(column_type, type_class)
+        return dict(defn)
+
+    def _lookup(self, column_type, type_class):
+        for cls in type_class.__mro__:
+            if cls in self._registry:
+                return self._registry[cls]
+
+        if issubclass(type_class, sa_types.TypeDecorator):
+            impl = getattr(column_type, "impl_instance", None)
+            if impl is None:
+                impl = getattr(column_type, "impl", None)
+            if impl is not None:
+                return self._lookup(
+                    impl, impl if isinstance(impl, type) else type(impl)
+                )
+
+        return self.default
+
+
+type_resolver = TypeResolver()
+type_resolver.register(sa_types.Integer, "integer", "int32")
+type_resolver.register(sa_types.SmallInteger, "integer", "int32")
+type_resolver.register(sa_types.BigInteger, "integer", "int64")
+type_resolver.register(sa_types.Numeric, "number")
+type_resolver.register(sa_types.Float, "number", "float")
+type_resolver.register(sa_types.String, "string")
+type_resolver.register(sa_types.Enum, "string")
+type_resolver.register(sa_types.Boolean, "boolean")
+type_resolver.register(sa_types.Date, "string", "date")
+type_resolver.register(sa_types.DateTime, "string", "date-time")
+type_resolver.register(sa_types.Time, "string", "time")
+type_resolver.register(sa_types.Interval, "number", "float")
+type_resolver.register(sa_types.LargeBinary, "string", "binary")
+type_resolver.register(sa_types._Binary, "string", "binary")
+type_resolver.register(sa_types.JSON, "object")
+type_resolver.register(sa_types.ARRAY, "array", items={})
+if hasattr(sa_types, "Double"):
+    type_resolver.register(sa_types.Double, "number", "double")
+if hasattr(sa_types, "Uuid"):
+    type_resolver.register(sa_types.Uuid, "string", "uuid")
@@ -0,0 +1,145 @@
+"""
+Negotiated compression of the generated API responses.
+
+gzip is always available; zstd and brotli are offered when the
+``zstandard`` or ``brotli`` package is installed. The coding is picked
+from ``Accept-Encoding``, preferring the client's highest quality and then
+the order of :attr:`ResponseCompressor.encodings`.
+"""
+
+import importlib.util
+import zlib
+
+#: Packages the optional content codings need.
+ENCODING_MODULES = {"zstd": "zstandard", "br": "brotli"}
+
+#: Response bodies are fed to the compressor in slices of this size.
+CHUNK_SIZE = 65536
+
+
+class BrotliStream(object):
+    """Gives a ``brotli.Compressor`` the ``compress``/``flush`` interface."""
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def gzip_compressor():
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def brotli_compressor():
+    import brotli
+
+    return BrotliStream(brotli.Compressor(quality=5))
+
+
+def zstd_compressor():
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=3).compressobj()
+
+
+#: Streaming compressor factories by content coding.
+compressors = {
+    "zstd": zstd_compressor,
+    "br": brotli_compressor,
+    "gzip": gzip_compressor,
+}
+
+
+def encoding_available(name):
+    module = ENCODING_MODULES.get(name)
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def iter_compressed(compressor, chunks):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ResponseCompressor(object):
+    """Compresses responses for clients that accept it.
+
+    Of `encodings`, those whose package is not installed are dropped.
+    Bodies smaller than `min_size` bytes are sent as they are, and bodies
+    of at least `stream_size` bytes are compressed chunk by chunk as they
+    are sent rather than all at once.
+    """
+
+    def __init__(
+        self, encodings=("zstd", "br", "gzip"), min_size=1024, stream_size=256 * 1024
+    ):
+        unknown = [name for name in encodings if name not in compressors]
+        if unknown:
+            raise ValueError(
+                "Unknown content coding(s) %s, expected some of %s"
+                % (", ".join(unknown), sorted(compressors))
+            )
+        self.encodings = tuple(name for name in encodings if encoding_available(name))
+        self.min_size = min_size
+        self.stream_size = stream_size
+
+    def negotiate(self, accept_encodings):
+        """The best of :attr:`encodings` for `accept_encodings`, or None."""
+        best, best_quality = None, 0
+        for name in self.encodings:
+            quality = accept_encodings.quality(name)
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def header(self):
+        """The swagger description of the ``Content-Encoding`` header."""
+        return {
+            "type": "string",
+            "enum": list(self.encodings) + ["identity"],
+            "description": "Bodies of at least %d bytes are compressed with "
+            "the best coding the client accepts" % self.min_size,
+        }
+
+    def compress(self, request, response):
+        """Compress `response` in place if the client and the body allow."""
+        if (
+            request.method == "HEAD"
+            or response.status_code not in (200, 201)
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            body = None
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+
+        compressor = compressors[encoding]()
+        if body is None or len(body) >= self.stream_size:
+            if body is None:
+                chunks = response.iter_encoded()
+            else:
+                chunks = (
+                    body[i : i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)
+                )
+            response.response = iter_compressed(compressor, chunks)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compressor.compress(body) + compressor.flush())
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None:
+            response.set_etag("%s-%s" % (etag, encoding), weak)
+        return response
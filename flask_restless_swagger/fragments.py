@@ -0,0 +1,76 @@
+"""
+Per-model fragments of a swagger spec.
+
+A fragment holds the paths of one model together with every component
+they reference. References to the definitions of other models become
+external references to those models' fragments, so clients can follow
+them on demand.
+"""
+
+
+def fragment_url(name):
+    return "%s.json" % name
+
+
+def build_fragment(spec, name, paths, models):
+    """Extract the fragment of model `name` from a frozen `spec`.
+
+    `paths` are the spec paths owned by the model and `models` the names
+    of all models that have fragments of their own.
+    """
+    fragment = {
+        "swagger": spec["swagger"],
+        "info": spec["info"],
+        "paths": {},
+        "definitions": {},
+        "parameters": {},
+        "responses": {},
+    }
+    pending = [("definitions", name)]
+
+    def rewrite(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/"):
+                section, _, key = ref[2:].partition("/")
+                if section == "definitions" and key in models and key != name:
+                    return {"$ref": "%s#/definitions/%s" % (fragment_url(key), key)}
+                pending.append((section, key))
+                return dict(node)
+            return {k: rewrite(v) for k, v in node.items()}
+        if isinstance(node, (list, tuple)):
+            return [rewrite(v) for v in node]
+        return node
+
+    for path in paths:
+        if path in spec["paths"]:
+            fragment["paths"][path] = rewrite(spec["paths"][path])
+    while pending:
+        section, key = pending.pop()
+        entries = fragment.get(section)
+        if entries is None or key in entries or key not in spec.get(section, {}):
+            continue
+        entries[key] = None
+        entries[key] = rewrite(spec[section][key])
+
+    for section in ("parameters", "responses"):
+        if not fragment[section]:
+            del fragment[section]
+    return fragment
+
+
+def build_index(spec, model_paths):
+    """A document listing the models of `spec` and their fragments."""
+    return {
+        "swagger": spec["swagger"],
+        "info": spec["info"],
+        "models": [
+            {
+                "name": name,
+                "paths": [path for path in paths if path in spec["paths"]],
+                "fragment": {"$ref": "models/" + fragment_url(name)},
+            }
+            for name, paths in sorted(model_paths.items())
+            if name in spec["definitions"]
+        ],
+    }
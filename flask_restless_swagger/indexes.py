@@ -0,0 +1,79 @@
+"""
+Index awareness: which columns can be searched cheaply, and a guard
+against collection queries that filter or sort on anything else.
+"""
+
+import logging
+
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint
+
+from .introspection import inspect_model, is_table_column
+
+logger = logging.getLogger(__name__)
+
+GUARD_MODES = ("warn", "reject")
+
+
+def indexed_columns(table):
+    """Names of the columns of `table` that lead an index.
+
+    Primary keys, unique constraints and explicit indexes count; only the
+    first column of a composite index is usable on its own.
+    """
+    leading = [index.columns for index in table.indexes]
+    leading.extend(
+        constraint.columns
+        for constraint in table.constraints
+        if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint))
+    )
+    return {list(columns)[0].name for columns in leading if len(columns)}
+
+
+def filter_names(filters):
+    """Yield the attribute names a Flask-Restless filter list refers to."""
+    for filt in filters:
+        if not isinstance(filt, dict):
+            continue
+        for key in ("or", "and"):
+            if key in filt:
+                yield from filter_names(filt[key])
+        if "not" in filt:
+            yield from filter_names([filt["not"]])
+        if "name" in filt and filt.get("op") not in ("has", "any"):
+            yield filt["name"]
+
+
+def query_guard_preprocessor(model, indexed, mode):
+    """A GET_COLLECTION preprocessor enforcing `mode` ("warn" or "reject")
+    on filters and sorts over columns of `model` outside `indexed`.
+
+    `indexed` holds column names, while clients filter and sort by mapped
+    attribute name; the two differ for ``name_ = Column("name", ...)``.
+    """
+    from flask_restless import ProcessingException
+
+    if mode not in GUARD_MODES:
+        raise ValueError("query_guard must be one of %s" % (GUARD_MODES,))
+    unindexed = frozenset(
+        attr.name
+        for attr in inspect_model(model).columns
+        if is_table_column(attr.column) and attr.column.name not in indexed
+    )
+
+    def guard_query(filters=None, sort=None, **kwargs):
+        names = set(filter_names(filters or ()))
+        names.update(field for _, field in sort or () if "." not in field)
+        offending = sorted(names & unindexed)
+        if not offending:
+            return
+        detail = "Filtering or sorting %s on unindexed column(s): %s" % (
+            model.__tablename__,
+            ", ".join(offending),
+        )
+        if mode == "reject":
+            raise ProcessingException(
+                status=400, title="Unindexed query", detail=detail
+            )
+        logger.warning(detail)
+
+    return guard_query
@@ -0,0 +1,103 @@
+"""
+Optional instrumentation of spec generation and doc traffic.
+
+:class:`Hooks` is a minimal callback registry. Managers only measure
+anything while at least one callback is connected, so leaving it empty
+costs a truth test per call. :class:`SpecStats` is a ready-made consumer
+that aggregates the events for the ``_stats`` endpoint.
+
+Events and their keyword arguments:
+
+``api_created``
+    `model`, `seconds` spent in :meth:`SwagAPIManager.create_api`.
+``model_documented``
+    `model`, `columns`, `defn_seconds` and `path_seconds`.
+``doc_rendered``
+    `document`, `seconds` spent serializing it and its `size` in bytes.
+``doc_served``
+    `document` and the response `status`.
+"""
+
+import threading
+from collections import Counter
+
+EVENTS = ("api_created", "model_documented", "doc_rendered", "doc_served")
+
+
+class Hooks(object):
+    def __init__(self):
+        self._callbacks = {event: [] for event in EVENTS}
+        self._connected = 0
+
+    def __bool__(self):
+        return self._connected > 0
+
+    __nonzero__ = __bool__
+
+    def connect(self, event, callback):
+        """Call `callback(**data)` whenever `event` is emitted."""
+        if event not in self._callbacks:
+            raise ValueError("Unknown event %r, expected one of %s" % (event, EVENTS))
+        self._callbacks[event].append(callback)
+        self._connected += 1
+        return callback
+
+    def disconnect(self, event, callback):
+        self._callbacks[event].remove(callback)
+        self._connected -= 1
+
+    def emit(self, event, **data):
+        for callback in self._callbacks[event]:
+            callback(**data)
+
+
+class SpecStats(object):
+    """Aggregates instrumentation events into a JSON-serializable report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.models = {}
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.renders = {}
+
+    def connect(self, hooks):
+        hooks.connect("api_created", self.api_created)
+        hooks.connect("model_documented", self.model_documented)
+        hooks.connect("doc_rendered", self.doc_rendered)
+        hooks.connect("doc_served", self.doc_served)
+        return self
+
+    def api_created(self, model, seconds):
+        with self._lock:
+            self.models.setdefault(model.__name__, {})["create_api_seconds"] = seconds
+
+    def model_documented(self, model, columns, defn_seconds, path_seconds):
+        with self._lock:
+            self.models.setdefault(model.__name__, {}).update(
+                columns=columns, defn_seconds=defn_seconds, path_seconds=path_seconds
+            )
+
+    def doc_rendered(self, document, seconds, size):
+        with self._lock:
+            render = self.renders.setdefault(
+                document, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            render["count"] += 1
+            render["total_seconds"] += seconds
+            render["max_seconds"] = max(render["max_seconds"], seconds)
+            render["size"] = size
+
+    def doc_served(self, document, status):
+        with self._lock:
+            self.requests[document] += 1
+            self.statuses[status] += 1
+
+    def report(self):
+        with self._lock:
+            return {
+                "models": dict(self.models),
+                "requests": dict(self.requests),
+                "statuses": {str(k): v for k, v in self.statuses.items()},
+                "renders": {k: dict(v) for k, v in self.renders.items()},
+            }
@@ -0,0 +1,122 @@
+"""
+Single-pass model introspection.
+
+:func:`inspect_model` reads everything the spec builder needs from a
+model's mapper at once -- column attributes, relationships, hybrid
+properties and association proxies -- and caches the result per mapper.
+"""
+
+import threading
+import weakref
+from collections import namedtuple
+
+from sqlalchemy import Column, inspect
+from sqlalchemy.ext.associationproxy import AssociationProxyExtensionType
+from sqlalchemy.ext.hybrid import HybridExtensionType
+from sqlalchemy.orm import ColumnProperty
+
+#: A mapped column attribute; `column` is the first column it maps.
+ColumnInfo = namedtuple("ColumnInfo", ["name", "column", "doc"])
+
+#: `direction` is the name of the relationship direction, e.g. ``"MANYTOONE"``.
+RelationshipInfo = namedtuple(
+    "RelationshipInfo", ["name", "target", "direction", "uselist", "doc"]
+)
+
+#: A hybrid property; `type` is the SQL type of its expression, if known.
+HybridInfo = namedtuple("HybridInfo", ["name", "type", "writable", "doc"])
+
+#: An association proxy; `type` is the SQL type of the proxied column, if any.
+#: Its `doc` is read from ``association_proxy(..., info={"doc": ...})``.
+ProxyInfo = namedtuple("ProxyInfo", ["name", "type", "scalar", "doc"])
+
+ModelInfo = namedtuple(
+    "ModelInfo",
+    ["table", "primary_key", "columns", "relationships", "hybrids", "proxies"],
+)
+
+_cache = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def inspect_model(model):
+    """Return the :class:`ModelInfo` of `model`, computing it once per mapper."""
+    mapper = inspect(model)
+    try:
+        return _cache[mapper]
+    except KeyError:
+        pass
+    info = _introspect(mapper)
+    with _lock:
+        return _cache.setdefault(mapper, info)
+
+
+def _introspect(mapper):
+    model = mapper.class_
+    columns = tuple(
+        ColumnInfo(prop.key, prop.columns[0], prop.doc)
+        for prop in mapper.column_attrs
+        if isinstance(prop, ColumnProperty)
+    )
+    relationships = tuple(
+        RelationshipInfo(
+            prop.key,
+            prop.mapper.class_,
+            prop.direction.name,
+            bool(prop.uselist),
+            prop.doc,
+        )
+        for prop in mapper.relationships
+    )
+
+    hybrids, proxies = [], []
+    for name, descriptor in mapper.all_orm_descriptors.items():
+        extension_type = getattr(descriptor, "extension_type", None)
+        if extension_type is HybridExtensionType.HYBRID_PROPERTY:
+            hybrids.append(
+                HybridInfo(
+                    name,
+                    _hybrid_type(model, name),
+                    descriptor.fset is not None,
+                    descriptor.__doc__,
+                )
+            )
+        elif extension_type is AssociationProxyExtensionType.ASSOCIATION_PROXY:
+            proxy = getattr(model, name)
+            remote = getattr(proxy.remote_attr, "property", None)
+            column_type = None
+            if isinstance(remote, ColumnProperty):
+                column_type = remote.columns[0].type
+            doc = descriptor.info.get("doc")
+            proxies.append(ProxyInfo(name, column_type, proxy.scalar, doc))
+
+    return ModelInfo(
+        mapper.local_table,
+        tuple(mapper.primary_key),
+        columns,
+        relationships,
+        tuple(hybrids),
+        tuple(proxies),
+    )
+
+
+def _hybrid_type(model, name):
+    try:
+        expression = getattr(model, name)
+    except Exception:
+        # A hybrid without an ``.expression`` whose body only works on
+        # instances; it has no SQL type.
+        return None
+    return _expression_type(expression)
+
+
+def _expression_type(expression):
+    column_type = getattr(expression, "type", None)
+    if column_type is None or column_type._isnull:
+        return None
+    return column_type
+
+
+def is_table_column(column):
+    """Whether `column` is a plain table column rather than an expression."""
+    return isinstance(column, Column)
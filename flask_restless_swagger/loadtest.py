@@ -0,0 +1,293 @@
+"""
+Offline load testing driven by the generated spec.
+
+:func:`run_load` rebuilds the APIs of a manager's registered models on a
+scratch SQLite database, seeds every table with synthetic rows shaped by
+the model definitions and replays a mix of requests from worker threads,
+timing each one against the path template it hit.
+"""
+
+import datetime
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from .introspection import inspect_model
+
+DEFAULT_MIX = {"get": 70, "post": 10, "patch": 15, "delete": 5}
+
+JSONAPI = "application/vnd.api+json"
+
+
+def parse_mix(text):
+    """Parse ``"get=70,post=10"`` into a dict of method weights."""
+    mix = {}
+    for part in text.split(","):
+        method, _, weight = part.partition("=")
+        method = method.strip().lower()
+        if method not in DEFAULT_MIX or not weight.strip().isdigit():
+            raise ValueError("Invalid mix entry %r" % part)
+        mix[method] = int(weight)
+    return mix
+
+
+def synthetic_value(schema, n):
+    """A Python value for the `n`-th row that satisfies property `schema`.
+
+    Values vary with `n`, so unique columns stay unique.
+    """
+    if "enum" in schema:
+        return schema["enum"][n % len(schema["enum"])]
+    kind, fmt = schema.get("type"), schema.get("format")
+    if kind == "integer":
+        return n
+    if kind == "number":
+        return n + 0.5
+    if kind == "boolean":
+        return bool(n % 2)
+    if kind == "string":
+        if fmt == "date":
+            return datetime.date(2000, 1, 1) + datetime.timedelta(days=n)
+        if fmt == "date-time":
+            return datetime.datetime(2000, 1, 1) + datetime.timedelta(minutes=n)
+        if fmt == "time":
+            return datetime.time(n // 60 % 24, n % 60)
+        if fmt == "uuid":
+            return uuid.UUID(int=n)
+        if fmt == "binary":
+            return b"%d" % n
+        value = "v%d" % n
+        return value[-schema["maxLength"] :] if "maxLength" in schema else value
+    return None
+
+
+def to_json_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+def writable_properties(model, definition):
+    """The definition properties of `model` that map to table columns."""
+    columns = {attr.name for attr in inspect_model(model).columns}
+    return {
+        name: schema
+        for name, schema in definition.get("properties", {}).items()
+        if name in columns and not schema.get("readOnly")
+    }
+
+
+class LoadTest(object):
+    """The APIs of `registrations` on a scratch database.
+
+    `registrations` are the ``(model, kwargs)`` pairs of a manager's
+    :meth:`~flask_restless_swagger.SwagAPIManager.create_api` calls.
+    """
+
+    def __init__(self, registrations, url_prefix="/db", database=None):
+        from . import SwagAPIManager
+
+        if database is None:
+            fd, database = tempfile.mkstemp(suffix=".sqlite")
+            os.close(fd)
+            self._cleanup = database
+        else:
+            self._cleanup = None
+        self.engine = create_engine(
+            "sqlite:///" + database,
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        metadatas = {id(model.metadata): model.metadata for model, _ in registrations}
+        for metadata in metadatas.values():
+            metadata.create_all(self.engine)
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+
+        self.app = Flask(__name__)
+        self.manager = SwagAPIManager(
+            self.app, session=self.session, url_prefix=url_prefix
+        )
+        self.url_prefix = url_prefix
+        self.models = {}
+        for model, kwargs in registrations:
+            self.manager.create_api(model, **kwargs)
+            self.models[model.__name__] = model
+        self.spec = self.manager.snapshot.spec
+        self.ids = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.session.remove()
+        self.engine.dispose()
+        if self._cleanup is not None:
+            os.unlink(self._cleanup)
+
+    def next_number(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def attributes(self, name):
+        model = self.models[name]
+        properties = writable_properties(model, self.spec["definitions"][name])
+        n = self.next_number()
+        return {prop: synthetic_value(schema, n) for prop, schema in properties.items()}
+
+    def seed(self, rows):
+        """Insert `rows` synthetic rows per model and remember their ids."""
+        for name, model in self.models.items():
+            instances = [model(**self.attributes(name)) for _ in range(rows)]
+            self.session.add_all(instances)
+            self.session.flush()
+            self.ids[name] = [
+                str(getattr(instance, self.primary_key(model)))
+                for instance in instances
+            ]
+        self.session.commit()
+        self.session.remove()
+
+    def primary_key(self, model):
+        return inspect_model(model).primary_key[0].key
+
+    def operations(self, mix):
+        """``(weight, method, template, name)`` for every documented operation."""
+        operations = []
+        for name, (path, id_path) in self.manager.model_paths.items():
+            for template in (path, id_path):
+                for method in self.spec["paths"].get(template, {}):
+                    if method in mix and mix[method]:
+                        operations.append((mix[method], method, template, name))
+        return operations
+
+    def request(self, client, method, template, name, rng):
+        url = self.url_prefix + template
+        if "{" in template:
+            ids = self.ids.get(name)
+            with self._lock:
+                if not ids:
+                    return None
+                resource_id = rng.choice(ids)
+            url = url[: url.index("{")] + resource_id
+        if method == "get":
+            return client.get(url)
+        if method == "delete":
+            response = client.delete(url)
+            if response.status_code < 300:
+                with self._lock:
+                    if resource_id in ids:
+                        ids.remove(resource_id)
+            return response
+        resource = {
+            "type": self.manager.manager.collection_name(self.models[name]),
+            "attributes": {
+                key: to_json_value(value)
+                for key, value in self.attributes(name).items()
+            },
+        }
+        if method == "patch":
+            resource["id"] = resource_id
+        body = json.dumps({"data": resource})
+        response = client.open(
+            url, method=method.upper(), data=body, content_type=JSONAPI
+        )
+        if method == "post" and response.status_code == 201:
+            with self._lock:
+                self.ids.setdefault(name, []).append(response.get_json()["data"]["id"])
+        return response
+
+    def run(self, requests=1000, threads=4, mix=None, seed=0):
+        """Replay `requests` requests from `threads` threads and report."""
+        operations = self.operations(mix or DEFAULT_MIX)
+        if not operations:
+            raise ValueError("The spec documents no operation in the mix")
+        weights = [operation[0] for operation in operations]
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        results_lock = threading.Lock()
+
+        def worker(index, count):
+            rng = random.Random(seed + index)
+            client = self.app.test_client()
+            local, local_errors = defaultdict(list), defaultdict(int)
+            for _ in range(count):
+                _, method, template, name = rng.choices(operations, weights)[0]
+                key = "%s %s" % (method.upper(), template)
+                started = time.perf_counter()
+                response = self.request(client, method, template, name, rng)
+                elapsed = time.perf_counter() - started
+                if response is None:
+                    continue
+                local[key].append(elapsed)
+                if response.status_code >= 400:
+                    local_errors[key] += 1
+                response.close()
+            self.session.remove()
+            with results_lock:
+                for key, values in local.items():
+                    timings[key].extend(values)
+                for key, value in local_errors.items():
+                    errors[key] += value
+
+        shares = [
+            requests // threads + (i < requests % threads) for i in range(threads)
+        ]
+        pool = [
+            threading.Thread(target=worker, args=(i, share))
+            for i, share in enumerate(shares)
+        ]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return report(timings, errors, time.perf_counter() - started)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of the sorted list `ordered`."""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def report(timings, errors, seconds):
+    endpoints = {}
+    for key, values in sorted(timings.items()):
+        values.sort()
+        endpoints[key] = {
+            "requests": len(values),
+            "errors": errors.get(key, 0),
+            "throughput": len(values) / seconds,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "seconds": seconds,
+        "requests": total,
+        "throughput": total / seconds,
+        "endpoints": endpoints,
+    }
+
+
+def run_load(manager, rows=100, **kwargs):
+    """Load test the models registered with `manager`; see :meth:`LoadTest.run`."""
+    load = LoadTest(manager.registrations, url_prefix=manager.url_prefix or "/db")
+    try:
+        load.seed(rows)
+        return load.run(**kwargs)
+    finally:
+        load.close()
@@ -0,0 +1,185 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+Requests are labelled with the swagger path template they hit, such as
+``/db/orders/{orderId}``, rather than the raw URL, so the number of series
+stays bounded. The template comes from a :class:`RouteIndex` keyed by the
+Flask URL rule that matched.
+
+Every thread records into its own shard, so observing a request takes no
+lock; shards are only merged when the metrics are scraped. The shard of a
+thread that exits is folded into a running total, so servers that start a
+thread per request do not accumulate shards.
+"""
+
+import re
+import threading
+import weakref
+from bisect import bisect_left
+
+#: Upper bounds of the latency histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+RULE_VARIABLE = re.compile(r"<(?:[^:<>]+:)?([^<>]+)>")
+
+
+class RouteIndex(object):
+    """Maps Flask URL rules onto swagger path templates.
+
+    Rules of the generated APIs are added as they are created; any other
+    rule is converted once, ``<converter:name>`` becoming ``{name}``.
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def add(self, rule, template):
+        self._templates[rule] = template
+
+    def template(self, rule):
+        try:
+            return self._templates[rule]
+        except KeyError:
+            template = self._templates[rule] = RULE_VARIABLE.sub(r"{\1}", rule)
+            return template
+
+
+class Series(object):
+    """Counts of one method and path template in one shard."""
+
+    __slots__ = ("count", "errors", "sum", "buckets", "codes")
+
+    def __init__(self, size):
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.buckets = [0] * size
+        self.codes = {}
+
+
+class ShardOwner(object):
+    """Held in a thread's local storage; finalized when the thread exits."""
+
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class Metrics(object):
+    """Request counts, server errors and latency histograms per endpoint."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix="restless"):
+        self.bounds = tuple(buckets)
+        self.prefix = prefix
+        self.routes = RouteIndex()
+        self._local = threading.local()
+        self._shards = []
+        #: Totals of the shards of threads that have exited.
+        self._retired = {}
+        # Reentrant: a shard may be retired by garbage collection while
+        # this thread holds the lock.
+        self._shards_lock = threading.RLock()
+
+    def _shard(self):
+        try:
+            return self._local.owner.shard
+        except AttributeError:
+            shard = {}
+            owner = self._local.owner = ShardOwner(shard)
+            weakref.finalize(owner, self._retire, shard)
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            self._merge(self._retired, shard)
+
+    def _merge(self, merged, shard):
+        for key, series in list(shard.items()):
+            total = merged.get(key)
+            if total is None:
+                total = merged[key] = Series(len(self.bounds) + 1)
+            total.count += series.count
+            total.errors += series.errors
+            total.sum += series.sum
+            for i, count in enumerate(series.buckets):
+                total.buckets[i] += count
+            for code, count in list(series.codes.items()):
+                total.codes[code] = total.codes.get(code, 0) + count
+
+    def observe(self, method, template, status, seconds):
+        shard = self._shard()
+        key = (method, template)
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = Series(len(self.bounds) + 1)
+        series.count += 1
+        series.sum += seconds
+        series.buckets[bisect_left(self.bounds, seconds)] += 1
+        code = "%dxx" % (status // 100)
+        series.codes[code] = series.codes.get(code, 0) + 1
+        if status >= 500:
+            series.errors += 1
+
+    def collect(self):
+        """Merge the shards into ``{(method, template): Series}``."""
+        merged = {}
+        with self._shards_lock:
+            # Under the lock, so a shard retired meanwhile is counted once.
+            self._merge(merged, self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            self._merge(merged, shard)
+        return merged
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        merged = sorted(self.collect().items())
+        name = self.prefix + "_http_requests_total"
+        lines = [
+            "# HELP %s Requests by path template and status class." % name,
+            "# TYPE %s counter" % name,
+        ]
+        for (method, template), series in merged:
+            for code, count in sorted(series.codes.items()):
+                lines.append(
+                    '%s{method="%s",path="%s",status="%s"} %d'
+                    % (name, method, escape(template), code, count)
+                )
+
+        name = self.prefix + "_http_request_errors_total"
+        lines += [
+            "# HELP %s Requests answered with a 5xx status." % name,
+            "# TYPE %s counter" % name,
+        ]
+        for (method, template), series in merged:
+            lines.append(
+                '%s{method="%s",path="%s"} %d'
+                % (name, method, escape(template), series.errors)
+            )
+
+        name = self.prefix + "_http_request_duration_seconds"
+        lines += [
+            "# HELP %s Request latency by path template." % name,
+            "# TYPE %s histogram" % name,
+        ]
+        for (method, template), series in merged:
+            labels = 'method="%s",path="%s"' % (method, escape(template))
+            cumulative = 0
+            for bound, count in zip(self.bounds + ("+Inf",), series.buckets):
+                cumulative += count
+                lines.append(
+                    '%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative)
+                )
+            lines.append("%s_sum{%s} %r" % (name, labels, series.sum))
+            lines.append("%s_count{%s} %d" % (name, labels, series.count))
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
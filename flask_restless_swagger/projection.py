@@ -0,0 +1,121 @@
+"""
+Default sparse fieldsets and deferred column loading.
+
+A model created with ``default_fields`` answers GET requests that send no
+``fields[<type>]`` parameter as if they had asked for those fields. For
+every projected request -- by default or by the client -- the columns
+left out are deferred, so the ORM does not load them at all.
+"""
+
+from flask import has_request_context, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import defer
+from werkzeug.datastructures import ImmutableMultiDict
+
+from .introspection import inspect_model
+
+ENVIRON_KEY = "restless.projection"
+
+
+class Projection(object):
+    """The sparse fieldsets of one model's GET endpoints.
+
+    `collection` is the JSON:API type of `model`; `default_fields` may be
+    None to only defer columns for fieldsets the client asks for.
+    """
+
+    def __init__(self, model, collection, default_fields=None):
+        info = inspect_model(model)
+        self.model = model
+        self.mapper = inspect(model)
+        self.collection = collection
+        self.parameter = "fields[%s]" % collection
+        self.fields = available_fields(model)
+        unknown = sorted(set(default_fields or ()) - set(self.fields))
+        if unknown:
+            raise ValueError(
+                "Unknown default field(s) of %s: %s"
+                % (model.__name__, ", ".join(unknown))
+            )
+        self.default_fields = list(default_fields) if default_fields else None
+        # Keys and foreign keys are always loaded: the id and the
+        # relationships of a resource are built from them.
+        self._deferrable = {
+            attr.name: getattr(model, attr.name)
+            for attr in info.columns
+            if not attr.column.primary_key and not attr.column.foreign_keys
+        }
+        self._options = {}
+
+    def defer_options(self, fields):
+        """Loader options deferring the columns not in `fields`."""
+        key = frozenset(fields)
+        try:
+            return self._options[key]
+        except KeyError:
+            pass
+        options = tuple(
+            defer(attribute)
+            for name, attribute in self._deferrable.items()
+            if name not in key
+        )
+        self._options[key] = options
+        return options
+
+    def apply(self):
+        """Add the default fieldset to the current request if it has none,
+        and record the columns to defer for :func:`defer_listener`."""
+        requested = request.args.get(self.parameter)
+        if requested is None:
+            if self.default_fields is None:
+                return
+            requested = ",".join(self.default_fields)
+            args = list(request.args.items(multi=True))
+            args.append((self.parameter, requested))
+            request.args = ImmutableMultiDict(args)
+        options = self.defer_options(requested.split(","))
+        if options:
+            request.environ[ENVIRON_KEY] = (self.mapper, options)
+
+
+def available_fields(model):
+    """The names a ``fields[<type>]`` parameter of `model` may list."""
+    info = inspect_model(model)
+    fields = [attr.name for attr in info.columns if attr.name != "id"]
+    return fields + [rel.name for rel in info.relationships]
+
+
+def fields_parameter(model, collection, default_fields=None):
+    """The swagger description of the ``fields[<collection>]`` parameter."""
+    parameter = {
+        "name": "fields[%s]" % collection,
+        "in": "query",
+        "description": "Sparse fieldset: the attributes and relationships to include",
+        "type": "array",
+        "items": {"type": "string", "enum": available_fields(model)},
+        "collectionFormat": "csv",
+    }
+    if default_fields:
+        parameter["default"] = list(default_fields)
+    return parameter
+
+
+def defer_listener(state):
+    """``do_orm_execute`` hook deferring the columns a projected request
+    left out of its primary query."""
+    if not state.is_select or state.is_column_load or state.is_relationship_load:
+        return
+    if not has_request_context():
+        return
+    projection = request.environ.get(ENVIRON_KEY)
+    if projection is None:
+        return
+    mapper, options = projection
+    if state.bind_mapper is mapper:
+        state.statement = state.statement.options(*options)
+
+
+def listen(session):
+    """Install :func:`defer_listener` on `session` (or session factory)."""
+    if not event.contains(session, "do_orm_execute", defer_listener):
+        event.listen(session, "do_orm_execute", defer_listener)
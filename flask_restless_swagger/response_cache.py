@@ -0,0 +1,255 @@
+"""
+Response caching for the generated GET endpoints.
+
+Each cached model has a :class:`ResponseCache` that keys responses on the
+request path, its normalized query arguments and the headers identifying
+the client, prefixed with a generation number kept in the backend. Lookups
+run as the model's last GET preprocessor, after any access checks. Writes to the model bump the
+generation, which makes every cached response of that model -- and only
+of that model -- unreachable at once; the backend evicts them later.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import Response, after_this_request, request
+
+#: Seconds a response is cached for with ``cache=True``.
+DEFAULT_TTL = 60
+
+#: Headers of a cached GET operation, as documented in the spec.
+CACHE_HEADERS = {
+    "X-Cache": {
+        "type": "string",
+        "enum": ["HIT", "MISS"],
+        "description": "Whether the response was served from the response cache",
+    },
+    "ETag": {"type": "string", "description": "Revalidate with If-None-Match"},
+    "Age": {"type": "integer", "description": "Seconds since the response was cached"},
+    "Cache-Control": {"type": "string", "default": "no-cache"},
+}
+
+#: Request headers that identify the client; responses are only shared
+#: between requests that send the same values.
+VARY_HEADERS = ("Authorization", "Cookie")
+
+
+class MemoryBackend(object):
+    """An in-process LRU bounded by the total size of its values.
+
+    Entries also expire `ttl` seconds after they are set. Generation
+    counters are kept apart and never evicted.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                self.size -= len(value)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (self.clock() + ttl, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+
+class DictBackend(object):
+    """A local stand-in for a shared cache such as memcached or Redis.
+
+    Values are bytes under string keys in `store`, which can be any
+    mapping. `lock` guards the counters, a thread lock by default; to
+    share the backend between processes, pass both from one
+    ``multiprocessing.Manager()``, e.g. ``store=manager.dict(),
+    lock=manager.Lock()``. Expiry is checked on read.
+    """
+
+    def __init__(self, store=None, clock=time.time, lock=None):
+        self.store = {} if store is None else store
+        self.clock = clock
+        self._lock = threading.Lock() if lock is None else lock
+
+    def get(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self.clock():
+            self.store.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self.store[key] = (self.clock() + ttl, bytes(value))
+
+    def counter(self, key):
+        return self.store.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            value = self.store[key] = self.store.get(key, 0) + 1
+            return value
+
+
+def normalized_query(args):
+    """The query arguments in a canonical order."""
+    return urlencode(sorted(args.items(multi=True)))
+
+
+class ResponseCache(object):
+    """The cached GET responses of one model."""
+
+    def __init__(self, backend, namespace, ttl=DEFAULT_TTL, vary=VARY_HEADERS):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.vary = vary
+        self.generation_key = "frs:%s:generation" % namespace
+
+    def key(self, request, params=()):
+        """The key of `request`; `params` are the arguments Flask-Restless
+        passed the preprocessors, e.g. filters added by earlier ones."""
+        generation = self.backend.counter(self.generation_key)
+        client = [request.headers.get(header) for header in self.vary]
+        return "frs:%s:%d:%s?%s#%s" % (
+            self.namespace,
+            generation,
+            request.path,
+            normalized_query(request.args),
+            hashlib.sha1(repr((client, params)).encode()).hexdigest(),
+        )
+
+    def lookup(self, key, request):
+        """The cached response under `key`, or None on a miss."""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        header, _, body = entry.partition(b"\n")
+        mimetype, etag, stored = json.loads(header)
+        if matches(request.if_none_match, etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=mimetype)
+        return self.finish(response, etag, "HIT", int(time.time() - stored))
+
+    def store(self, key, response):
+        body = response.get_data()
+        etag = hashlib.sha1(body).hexdigest()
+        header = json.dumps([response.mimetype, etag, time.time()]).encode()
+        self.backend.set(key, header + b"\n" + body, self.ttl)
+        return self.finish(response, etag, "MISS", 0)
+
+    def finish(self, response, etag, state, age):
+        response.set_etag(etag)
+        response.headers["X-Cache"] = state
+        response.headers["Age"] = str(age)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def invalidate(self):
+        """Make every response cached so far unreachable."""
+        self.backend.incr(self.generation_key)
+
+
+def matches(if_none_match, etag):
+    """Whether `if_none_match` names `etag`, or `etag` with the
+    ``-<coding>`` suffix given to compressed responses."""
+    prefix = etag + "-"
+    return any(tag == etag or tag.startswith(prefix) for tag in if_none_match)
+
+
+class CacheHit(Exception):
+    """Raised by :func:`lookup_preprocessors` to skip the view; the
+    application's error handler for it answers with `response`."""
+
+    def __init__(self, response):
+        super(CacheHit, self).__init__()
+        self.response = response
+
+
+def lookup_preprocessors(cache):
+    """Flask-Restless preprocessors that answer GETs from `cache`.
+
+    They must run after every other GET preprocessor, so cached responses
+    are only served once the request passed the model's checks. A hit
+    raises :class:`CacheHit`, which skips the query; a miss stores the
+    response once the view returns it.
+    """
+
+    def serve_cached(**kwargs):
+        key = cache.key(request, sorted(kwargs.items()))
+        response = cache.lookup(key, request)
+        if response is not None:
+            raise CacheHit(response)
+
+        @after_this_request
+        def store_response(response):
+            if response.status_code == 200:
+                cache.store(key, response)
+            return response
+
+    return {"GET_COLLECTION": [serve_cached], "GET_RESOURCE": [serve_cached]}
+
+
+def invalidation_postprocessors(cache):
+    """Flask-Restless postprocessors that clear `cache` on writes.
+
+    Flask-Restless runs POST and PATCH postprocessors before it commits,
+    so the generation is bumped there and again once the response is
+    ready: a read that slipped in between and cached the old rows did so
+    under the intermediate generation, which the second bump retires.
+    """
+
+    def invalidate(**kwargs):
+        cache.invalidate()
+
+        @after_this_request
+        def invalidate_after_commit(response):
+            cache.invalidate()
+            return response
+
+    return {
+        "POST_RESOURCE": [invalidate],
+        "PATCH_RESOURCE": [invalidate],
+        "DELETE_RESOURCE": [invalidate],
+        "POST_RELATIONSHIP": [invalidate],
+        "PATCH_RELATIONSHIP": [invalidate],
+        "DELETE_RELATIONSHIP": [invalidate],
+    }
@@ -0,0 +1,127 @@
+"""
+Serialization of swagger specs: pluggable JSON backends, YAML through
+libyaml when available, and incremental JSON for very large specs.
+"""
+
+import json
+
+#: Sections written one entry at a time by :func:`iter_json`.
+STREAMED_SECTIONS = ("paths", "definitions", "parameters", "responses")
+
+
+def iter_json(spec, chunk_size=65536, separators=(",", ":"), **kwargs):
+    """Yield `spec` serialized as JSON in chunks of about `chunk_size`.
+
+    Entries of the large sections are encoded one at a time, so the whole
+    document never exists as a single string. Other keyword arguments are
+    passed on to :class:`json.JSONEncoder`.
+    """
+    encode = json.JSONEncoder(separators=separators, **kwargs).encode
+    item_sep, key_sep = separators
+    buffer = []
+    size = 0
+
+    def pieces():
+        yield "{"
+        for i, (key, value) in enumerate(spec.items()):
+            if i:
+                yield item_sep
+            yield encode(key) + key_sep
+            if key in STREAMED_SECTIONS and isinstance(value, dict):
+                yield "{"
+                for j, (name, entry) in enumerate(value.items()):
+                    if j:
+                        yield item_sep
+                    yield encode(str(name)) + key_sep
+                    yield encode(entry)
+                yield "}"
+            else:
+                yield encode(value)
+        yield "}"
+
+    for piece in pieces():
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def dump_json(spec, fp, **kwargs):
+    """Write `spec` to the text file-like object `fp` in chunks."""
+    for chunk in iter_json(spec, **kwargs):
+        fp.write(chunk)
+
+
+def stdlib_dumps(obj, **kwargs):
+    return json.dumps(obj, **kwargs).encode("utf-8")
+
+
+def compact_stdlib_dumps(obj, **kwargs):
+    kwargs.setdefault("separators", (",", ":"))
+    return stdlib_dumps(obj, **kwargs)
+
+
+def orjson_dumps(obj, indent=None, sort_keys=False, **kwargs):
+    """orjson supports only `sort_keys` and an `indent` of 2; any other
+    encoder argument raises ValueError."""
+    import orjson
+
+    if kwargs:
+        raise ValueError(
+            "The orjson JSON backend does not support %s" % ", ".join(sorted(kwargs))
+        )
+    if indent not in (None, 0, 2):
+        raise ValueError("The orjson JSON backend only supports indent=2")
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, option=option)
+
+
+#: JSON backends by name; each takes the object and encoder keyword
+#: arguments and returns UTF-8 bytes.
+json_backends = {"json": stdlib_dumps, "orjson": orjson_dumps}
+
+#: Variants of :data:`json_backends` that default to the most compact
+#: output, for the documents served over HTTP.
+compact_json_backends = {"json": compact_stdlib_dumps}
+
+
+def get_json_backend(name, compact=False):
+    """Return the ``dumps`` of backend `name`, checking it can be used.
+
+    With `compact`, the variant without whitespace is returned if the
+    backend has one.
+    """
+    try:
+        dumps = json_backends[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown JSON backend %r, expected one of %s"
+            % (name, sorted(json_backends))
+        )
+    if compact:
+        dumps = compact_json_backends.get(name, dumps)
+    dumps({})
+    return dumps
+
+
+def yaml_dumper():
+    """The fastest safe YAML dumper available."""
+    import yaml
+
+    return getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def dump_yaml(obj, **kwargs):
+    import yaml
+
+    kwargs.setdefault("Dumper", yaml_dumper())
+    kwargs.setdefault("default_flow_style", False)
+    return yaml.dump(obj, **kwargs)
@@ -0,0 +1,184 @@
+"""
+A spec document shared between pre-fork worker processes.
+
+The document is written once, as JSON and YAML, to files named after a
+fingerprint of the registered models, by whichever process takes the file
+lock first, and every process serves them from read-only memory maps. The
+mapped pages live in the OS page cache, so workers hold no copy of the
+spec dicts.
+"""
+
+import glob
+import gzip
+import mmap
+import os
+import tempfile
+import threading
+
+from flask import Response
+from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import QueryableAttribute
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not POSIX
+    fcntl = None
+
+#: Size of the slices a mapped document is sent in.
+CHUNK_SIZE = 65536
+
+#: Serialized formats of the shared spec and their media types.
+FORMATS = {".json": "application/json", ".yaml": "application/yaml"}
+
+#: Class attributes whose names and docstrings end up in the spec.
+DOCUMENTED_ATTRIBUTES = (QueryableAttribute, hybrid_property, AssociationProxy)
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def model_signature(model):
+    """What the documentation of `model` is built from, read off its class
+    and table without introspecting the mapper.
+
+    It holds the model's name, docstring and documented attributes with
+    their docstrings, and the schema of its table: columns with their
+    types, keys and constraints, foreign keys and indexes.
+    """
+    table = model.__table__
+    columns = [
+        (
+            column.name,
+            column.key,
+            repr(column.type),
+            column.primary_key,
+            column.nullable,
+            column.unique,
+            column.comment,
+            sorted(fk.target_fullname for fk in column.foreign_keys),
+        )
+        for column in table.columns
+    ]
+    indexes = sorted(
+        (index.name or "", index.unique, [column.name for column in index.columns])
+        for index in table.indexes
+    )
+    attributes = sorted(
+        (name, value.__doc__)
+        for name, value in vars(model).items()
+        if isinstance(value, DOCUMENTED_ATTRIBUTES)
+    )
+    return repr(
+        (
+            model.__module__,
+            model.__qualname__,
+            model.__doc__,
+            table.fullname,
+            table.comment,
+            columns,
+            indexes,
+            attributes,
+        )
+    )
+
+
+class SharedSpec(object):
+    """The spec files for one `fingerprint`, mapped into this process.
+
+    `path` is the base name, e.g. ``instance/dbdoc.json``; the document
+    is stored as ``instance/dbdoc.<fingerprint>.json`` and ``.yaml``, each
+    next to a gzip compressed copy.
+    """
+
+    def __init__(self, path, fingerprint):
+        stem = os.path.splitext(path)[0]
+        self.stem = stem
+        self.base = "%s.%s" % (stem, fingerprint)
+        self.path = self.base + ".json"
+        self.lock_path = stem + ".lock"
+        self.etag = fingerprint
+        #: Whether this process wrote the files rather than found them.
+        self.built = False
+        #: extension -> (mapped body, mapped gzip body)
+        self.bodies = None
+        self._lock = threading.Lock()
+
+    def ensure(self, build):
+        """Map the documents, calling `build` for a dict of their bytes
+        by extension if no process has written them yet."""
+        with self._lock:
+            if self.bodies is not None:
+                return self
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # The gzip copy of the JSON goes last: its presence marks a
+            # complete set of files.
+            marker = self.path + ".gz"
+            with open(self.lock_path, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if not os.path.exists(marker):
+                        self._write(build())
+                        self.built = True
+                    # Mapped under the lock: a writer of another
+                    # fingerprint deletes these files once it is unlocked.
+                    bodies = {
+                        ext: (_map(self.base + ext), _map(self.base + ext + ".gz"))
+                        for ext in FORMATS
+                    }
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+            self.bodies = bodies
+        return self
+
+    def _write(self, documents):
+        written = []
+        for ext in sorted(FORMATS, key=lambda ext: ext == ".json"):
+            body = documents[ext]
+            _write_atomic(self.base + ext, body)
+            _write_atomic(
+                self.base + ext + ".gz", gzip.compress(body, compresslevel=9, mtime=0)
+            )
+            written += [self.base + ext, self.base + ext + ".gz"]
+        for ext in FORMATS:
+            pattern = "%s.*%s" % (self.stem, ext)
+            for stale in glob.glob(pattern) + glob.glob(pattern + ".gz"):
+                if stale not in written:
+                    os.unlink(stale)
+
+    def make_response(self, request, ext=".json"):
+        """Stream the mapped document in format `ext`, honouring
+        ``If-None-Match`` and ``Accept-Encoding`` like
+        :class:`~.cache.RenderedDoc`."""
+        body, gzip_body = self.bodies[ext]
+        etag = self.etag if ext == ".json" else self.etag + ext.replace(".", "-")
+        use_gzip = "gzip" in request.accept_encodings
+        if use_gzip:
+            body, etag = gzip_body, etag + "-gz"
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            chunks = (body[i : i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+            response = Response(chunks, mimetype=FORMATS[ext])
+            response.content_length = len(body)
+            if use_gzip:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
@@ -0,0 +1,267 @@
+"""
+Per-manager swagger spec storage.
+
+Writers edit a private working copy under a lock; readers only ever see
+immutable :class:`SpecSnapshot` objects, which are swapped in with a single
+attribute assignment and so can be read without locking. Snapshots are
+published on the first read after a write, so registering many models one
+edit at a time does not publish once per model.
+"""
+
+import copy
+import json
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+def default_spec():
+    return {
+        "swagger": "2.0",
+        "info": {"title": "DB API", "version": ""},
+        "consumes": ["application/vnd.api+json"],
+        "produces": ["application/vnd.api+json"],
+        "paths": {},
+        "definitions": {},
+        "parameters": {},
+        "responses": {},
+    }
+
+
+class FrozenDict(dict):
+    """A dict that refuses to be changed after construction."""
+
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("swagger spec snapshots are read-only")
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value):
+    """Recursively convert `value` into FrozenDicts and tuples."""
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Recursively convert a frozen spec back into plain dicts and lists."""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+#: `changed` maps ``(section, key)`` of every keyed-section entry ever
+#: published to the generation in which it last changed or was removed.
+SpecSnapshot = namedtuple("SpecSnapshot", ["generation", "spec", "changed"])
+
+
+def changes_since(snapshot, version):
+    """The keyed entries of `snapshot` that changed after generation `version`.
+
+    Returns ``(changed, removed)``: `changed` maps each section to the
+    entries changed or added since, and `removed` to the keys deleted since.
+    """
+    changed, removed = {}, {}
+    for (section, key), generation in snapshot.changed.items():
+        if generation <= version:
+            continue
+        entries = snapshot.spec.get(section, {})
+        if key in entries:
+            changed.setdefault(section, {})[key] = entries[key]
+        else:
+            removed.setdefault(section, []).append(key)
+    return changed, removed
+
+
+def replace_refs(value, old, new):
+    """Point every ``$ref`` to `old` inside `value` at `new` instead.
+
+    Returns whether anything was replaced.
+    """
+    replaced = False
+    if isinstance(value, dict):
+        if value.get("$ref") == old:
+            value["$ref"] = new
+            replaced = True
+        for item in value.values():
+            replaced = replace_refs(item, old, new) or replaced
+    elif isinstance(value, list):
+        for item in value:
+            replaced = replace_refs(item, old, new) or replaced
+    return replaced
+
+
+def free_name(entries, name):
+    """`name`, suffixed with a number if `entries` already has it."""
+    candidate, suffix = name, 1
+    while candidate in entries:
+        suffix += 1
+        candidate = "%s%d" % (name, suffix)
+    return candidate
+
+
+class SpecStore(object):
+    """Holds the working spec of one manager and publishes snapshots of it.
+
+    Entries of the sections in :attr:`keyed_sections` are frozen one at a
+    time and reused between snapshots until they are :meth:`touch`-ed, so
+    publishing after adding a model costs little more than the model itself.
+    Publishing still visits every key, so it is deferred until
+    :attr:`snapshot` is read.
+    """
+
+    keyed_sections = ("paths", "definitions", "parameters", "responses")
+
+    #: Serialized size below which :meth:`intern` does not share a value.
+    min_shared_size = 48
+
+    def __init__(self, spec=None):
+        self.spec = copy.deepcopy(spec) if spec is not None else default_spec()
+        self.listeners = []
+        self.lock = threading.RLock()
+        self._depth = 0
+        self._stale = False
+        self._frozen = {section: {} for section in self.keyed_sections}
+        self._dirty = {section: set() for section in self.keyed_sections}
+        self._interned = {}
+        self._interned_names = {}
+        self._changed = {}
+        self._snapshot = SpecSnapshot(0, freeze(self.spec), FrozenDict())
+
+    @property
+    def snapshot(self):
+        """The latest :class:`SpecSnapshot`, published now if the working
+        spec changed since.
+
+        Readers never wait for a writer: while another thread is editing,
+        or inside an ``edit`` block, the last published snapshot is
+        returned.
+        """
+        if self._stale and self._depth == 0 and self.lock.acquire(blocking=False):
+            try:
+                if self._stale and self._depth == 0:
+                    self.publish()
+            finally:
+                self.lock.release()
+        return self._snapshot
+
+    @property
+    def generation(self):
+        return self.snapshot.generation
+
+    def touch(self, section, key):
+        """Mark `key` of `section` as changed since the last snapshot."""
+        if section in self._dirty:
+            self._dirty[section].add(key)
+
+    def intern(self, section, name, value):
+        """Store `value` as a shared component and return a ``$ref`` to it.
+
+        Components are hash-consed: a value structurally equal to one
+        already stored in `section` reuses that entry. Otherwise it is
+        stored under `name`, suffixed with a number if `name` is taken.
+        Values no larger than a reference are returned inline.
+        """
+        serialized = json.dumps(value, sort_keys=True, default=str)
+        if len(serialized) <= self.min_shared_size:
+            return value
+        key = (section, serialized)
+        with self.lock:
+            ref_name = self._interned.get(key)
+            if ref_name is None:
+                entries = self.spec.setdefault(section, {})
+                ref_name = free_name(entries, name)
+                entries[ref_name] = value
+                self.touch(section, ref_name)
+                self._interned[key] = ref_name
+                self._interned_names[section, ref_name] = key
+        return {"$ref": "#/%s/%s" % (section, ref_name)}
+
+    def reserve(self, section, name):
+        """Free `name` in `section` for an entry that is not interned.
+
+        A shared component stored under `name` by :meth:`intern` is moved
+        to a suffixed name and every ``$ref`` to it is rewritten.
+        """
+        with self.lock:
+            key = self._interned_names.pop((section, name), None)
+            if key is None:
+                return
+            entries = self.spec[section]
+            new_name = free_name(entries, name)
+            entries[new_name] = entries.pop(name)
+            self._interned[key] = new_name
+            self._interned_names[section, new_name] = key
+            self.touch(section, new_name)
+            old_ref = "#/%s/%s" % (section, name)
+            new_ref = "#/%s/%s" % (section, new_name)
+            for keyed in self.keyed_sections:
+                for entry_name, entry in self.spec.get(keyed, {}).items():
+                    if replace_refs(entry, old_ref, new_ref):
+                        self.touch(keyed, entry_name)
+
+    @contextmanager
+    def edit(self):
+        """Lock the working spec for writing.
+
+        Changes become visible together, in the snapshot published on the
+        first read after the outermost ``edit`` block exits.
+        """
+        with self.lock:
+            self._depth += 1
+            try:
+                yield self.spec
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._stale = True
+
+    def publish(self):
+        with self.lock:
+            self._stale = False
+            generation = self._snapshot.generation + 1
+            spec = {}
+            for section, value in self.spec.items():
+                if section not in self._frozen:
+                    spec[section] = freeze(value)
+                    continue
+                frozen = self._frozen[section]
+                dirty = self._dirty[section]
+                for key in list(frozen):
+                    if key not in value:
+                        del frozen[key]
+                        self._changed[section, key] = generation
+                for key, entry in value.items():
+                    if key in dirty or key not in frozen:
+                        frozen[key] = freeze(entry)
+                        self._changed[section, key] = generation
+                dirty.clear()
+                spec[section] = FrozenDict((key, frozen[key]) for key in value)
+
+            snapshot = SpecSnapshot(
+                generation, FrozenDict(spec), FrozenDict(self._changed)
+            )
+            self._snapshot = snapshot
+
+        for listener in self.listeners:
+            listener(snapshot)
+        return snapshot
@@ -0,0 +1,190 @@
+"""
+Swagger UI served from the assets bundled with flask-swagger-ui.
+
+With asset caching, every static file is given a content-hashed name, so
+it can be cached as immutable, and text files are gzip-compressed once, on
+their first request. Nothing is fetched from the network.
+
+flask-swagger-ui itself is only imported when the UI is first set up.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    send_file,
+    send_from_directory,
+)
+
+# Source maps are left out: only developer tools fetch them, and they are
+# the largest files in the bundle.
+COMPRESSIBLE = (".js", ".css", ".html", ".json", ".txt")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class StaticBundle(object):
+    """Fingerprinted, precompressed view of a directory of static files.
+
+    Files are hashed up front, so the fingerprinted names are known when
+    the index page is rendered, but each one is only compressed when it is
+    first requested with gzip.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        #: original file name -> fingerprinted name
+        self.fingerprints = {}
+        #: fingerprinted or original name -> (path, compressible, etag)
+        self.files = {}
+        #: path -> gzip bytes, filled on demand
+        self.compressed = {}
+        self.lock = threading.Lock()
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if not os.path.isfile(path):
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+            stem, ext = os.path.splitext(filename)
+            fingerprinted = "%s.%s%s" % (stem, digest[:12], ext)
+            self.fingerprints[filename] = fingerprinted
+            entry = (path, filename.endswith(COMPRESSIBLE), digest[:32])
+            self.files[filename] = entry
+            self.files[fingerprinted] = entry
+
+    def gzipped(self, path):
+        """The gzip-compressed content of `path`, compressed once."""
+        try:
+            return self.compressed[path]
+        except KeyError:
+            pass
+        with self.lock:
+            if path not in self.compressed:
+                with open(path, "rb") as f:
+                    content = f.read()
+                self.compressed[path] = gzip.compress(content, compresslevel=9, mtime=0)
+            return self.compressed[path]
+
+    def serve(self, filename):
+        """Response for `filename`, or None if the bundle has no such file."""
+        entry = self.files.get(filename)
+        if entry is None:
+            return None
+        path, compressible, etag = entry
+        immutable = filename not in self.fingerprints
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        if compressible and "gzip" in request.accept_encodings:
+            etag += "-gz"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = Response(self.gzipped(path), mimetype=mimetype)
+                response.headers["Content-Encoding"] = "gzip"
+            response.set_etag(etag)
+        else:
+            response = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE if immutable else "no-cache"
+        return response
+
+
+def swagger_ui_root():
+    """The directory of the installed flask-swagger-ui package."""
+    import flask_swagger_ui
+
+    return os.path.dirname(flask_swagger_ui.__file__)
+
+
+def swaggerui_view(base_url, api_url, config=None, cache_assets=False):
+    """The view serving the Swagger UI page and its assets under `base_url`.
+
+    It behaves like the blueprint of
+    :func:`flask_swagger_ui.get_swaggerui_blueprint`; with `cache_assets`
+    the assets go through a :class:`StaticBundle`.
+    """
+    root = swagger_ui_root()
+    dist = os.path.join(root, "dist")
+    bundle = StaticBundle(dist) if cache_assets else None
+    with open(os.path.join(root, "templates", "index.template.html")) as f:
+        template_source = f.read()
+    template = []
+
+    ui_config = {
+        "app_name": "Swagger UI",
+        "dom_id": "#swagger-ui",
+        "url": api_url,
+        "layout": "StandaloneLayout",
+        "deepLinking": True,
+    }
+    ui_config.update(config or {})
+    app_name = ui_config.pop("app_name")
+
+    def show(path=None):
+        if path and path != "index.html":
+            if bundle is None:
+                return send_from_directory(dist, path)
+            response = bundle.serve(path)
+            if response is None:
+                return Response(status=404)
+            return response
+
+        if not template:
+            template.append(current_app.jinja_env.from_string(template_source))
+        page_config = dict(ui_config)
+        page_config.setdefault(
+            "oauth2RedirectUrl", os.path.join(request.base_url, "oauth2-redirect.html")
+        )
+        html = template[0].render(
+            base_url=base_url, app_name=app_name, config_json=json.dumps(page_config)
+        )
+        if bundle is None:
+            return html
+        for filename, fingerprinted in bundle.fingerprints.items():
+            html = html.replace(
+                '"%s/%s"' % (base_url, filename), '"%s/%s"' % (base_url, fingerprinted)
+            )
+        response = Response(html, mimetype="text/html")
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    show.bundle = bundle
+    return show
+
+
+def lazy_swaggerui_view(*args, **kwargs):
+    """Like :func:`swaggerui_view`, but only set up on the first request."""
+    view = []
+    lock = threading.Lock()
+
+    def show(path=None):
+        if not view:
+            with lock:
+                if not view:
+                    view.append(swaggerui_view(*args, **kwargs))
+        return view[0](path)
+
+    return show
+
+
+def swaggerui_blueprint(base_url, api_url, config=None, blueprint_name="swagger_ui"):
+    """A drop-in for :func:`flask_swagger_ui.get_swaggerui_blueprint` that
+    serves the assets through a :class:`StaticBundle`."""
+    blueprint = Blueprint(blueprint_name, __name__, url_prefix=base_url)
+    show = swaggerui_view(base_url, api_url, config, cache_assets=True)
+    blueprint.bundle = show.bundle
+    blueprint.add_url_rule("/", "show", show)
+    blueprint.add_url_rule("/<path:path>", "show", show)
+    return blueprint
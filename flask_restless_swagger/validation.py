@@ -0,0 +1,114 @@
+"""
+Request body validation compiled from swagger definitions.
+
+:func:`compile_validator` turns a model definition into the source of a
+plain Python function once, so checking a payload costs a handful of
+``isinstance`` calls rather than a walk over the schema.
+"""
+
+TYPE_CHECKS = {
+    "integer": "isinstance(value, int) and not isinstance(value, bool)",
+    "number": "isinstance(value, (int, float)) and not isinstance(value, bool)",
+    "string": "isinstance(value, str)",
+    "boolean": "isinstance(value, bool)",
+    "object": "isinstance(value, dict)",
+    "array": "isinstance(value, list)",
+}
+
+MISSING = object()
+
+
+def compile_validator(definition, name="validate"):
+    """Compile `definition` into ``validate(attributes, partial)``.
+
+    The function returns a list of ``(attribute, message)`` pairs, empty
+    when `attributes` is valid. With `partial` (PATCH), required
+    attributes may be left out.
+    """
+    properties = definition.get("properties", {})
+    required = set(definition.get("required", ()))
+    namespace = {"MISSING": MISSING, "KNOWN": frozenset(properties)}
+    lines = [
+        "def %s(attributes, partial):" % name,
+        "    if not isinstance(attributes, dict):",
+        "        return [('', 'attributes must be an object')]",
+        "    errors = []",
+    ]
+    for i, (prop, schema) in enumerate(sorted(properties.items())):
+        check = TYPE_CHECKS.get(schema.get("type"))
+        if check is None:
+            continue
+        lines.append("    value = attributes.get(%r, MISSING)" % prop)
+        if prop in required:
+            lines += [
+                "    if value is MISSING:",
+                "        if not partial:",
+                "            errors.append((%r, 'is required'))" % prop,
+                "    elif value is None:",
+                "        errors.append((%r, 'may not be null'))" % prop,
+            ]
+        else:
+            lines.append("    if value is MISSING or value is None:")
+            lines.append("        pass")
+        lines += [
+            "    elif not (%s):" % check,
+            "        errors.append((%r, 'must be of type %s'))"
+            % (prop, schema["type"]),
+        ]
+        if "maxLength" in schema:
+            lines += [
+                "    elif len(value) > %d:" % schema["maxLength"],
+                "        errors.append((%r, 'is longer than %d characters'))"
+                % (prop, schema["maxLength"]),
+            ]
+        if "enum" in schema:
+            namespace["ENUM_%d" % i] = frozenset(schema["enum"])
+            lines += [
+                "    elif value not in ENUM_%d:" % i,
+                "        errors.append((%r, 'is not one of the allowed values'))"
+                % prop,
+            ]
+    lines += [
+        "    for key in attributes.keys() - KNOWN:",
+        "        errors.append((key, 'is not a known attribute'))",
+        "    return errors",
+    ]
+    code = compile("\n".join(lines) + "\n", "<validator %s>" % name, "exec")
+    exec(code, namespace)
+    return namespace[name]
+
+
+def validation_preprocessors(validate):
+    """Flask-Restless preprocessors that reject invalid POST/PATCH bodies.
+
+    Invalid payloads are answered with a JSON:API error before the
+    request reaches the session.
+    """
+    from flask_restless import ProcessingException
+
+    def check(data, partial):
+        resource = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(resource, dict):
+            raise ProcessingException(
+                status=400,
+                title="Invalid request body",
+                detail="The request body must contain a 'data' object",
+                source={"pointer": "/data"},
+            )
+        errors = validate(resource.get("attributes", {}), partial)
+        if errors:
+            attribute, message = errors[0]
+            raise ProcessingException(
+                status=400,
+                title="Invalid attribute",
+                detail="; ".join("%s %s" % error for error in errors),
+                source={"pointer": "/data/attributes/" + attribute},
+            )
+
+    def validate_post(data=None, **kwargs):
+        check(data, partial=False)
+
+    def validate_patch(resource_id=None, data=None, **kwargs):
+        check(data, partial=True)
+
+    return {"POST_RESOURCE": [validate_post], "PATCH_RESOURCE": [validate_patch]}
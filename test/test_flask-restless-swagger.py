@@ -2,7 +2,1453 @@
 Tests for `flask-restless-swagger` module.
 """
 
+import gzip
+import json
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, create_engine
+from sqlalchemy.orm import declarative_base, relationship, scoped_session, sessionmaker
+
 import flask_restless_swagger
+from flask_restless_swagger import SwagAPIManager
+from flask_restless_swagger.spec import thaw
+
+Base = declarative_base()
+
+
+class Person(Base):
+    """A person."""
+
+    __tablename__ = "person"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64))
+    bio = Column(Text)
+
+
+class Article(Base):
+    __tablename__ = "article"
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    author_id = Column(Integer, ForeignKey("person.id"))
+    author = relationship(Person, backref="articles")
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+@pytest.fixture
+def manager(app, session):
+    return SwagAPIManager(app, session=session)
+
 
 def test_import():
-    assert 'SwagAPIManager' in dir(flask_restless_swagger)
+    assert "SwagAPIManager" in dir(flask_restless_swagger)
+
+
+def test_doc_json(app, manager):
+    manager.create_api(Person, methods=["GET", "POST"])
+    doc = app.test_client().get("/dbdoc.json").get_json()
+    assert doc["host"] == "localhost"
+    assert doc["basePath"] == "/db"
+    assert "/person" in doc["paths"]
+    assert "Person" in doc["definitions"]
+    served = app.test_client().get("/dbdoc.json").data
+    assert served.startswith(b'{"swagger":"2.0",')
+    assert manager.to_json().startswith('{"swagger": "2.0", ')
+    assert str(manager).startswith('{\n    "swagger": "2.0",\n')
+
+
+def test_doc_json_etag_and_gzip(app, manager):
+    manager.create_api(Person)
+    client = app.test_client()
+
+    response = client.get("/dbdoc.json")
+    etag = response.headers["ETag"]
+    assert client.get("/dbdoc.json", headers={"If-None-Match": etag}).status_code == 304
+
+    response = client.get("/dbdoc.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.data))["host"] == "localhost"
+
+    manager.title = "Other API"
+    response = client.get("/dbdoc.json", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["info"]["title"] == "Other API"
+
+
+def test_create_api_clears_doc_cache(manager):
+    manager.doc_cache.put(("localhost", "http", "/db"), None)
+    manager.create_api(Article)
+    # Published, and the cache cleared, on the next read.
+    assert "Article" in manager.snapshot.spec["definitions"]
+    assert len(manager.doc_cache) == 0
+
+
+def test_doc_json_per_host(app, manager):
+    manager.create_api(Person)
+    client = app.test_client()
+    client.get("/dbdoc.json", base_url="http://a.example")
+    doc = client.get("/dbdoc.json", base_url="https://b.example").get_json()
+    assert doc["host"] == "b.example"
+    assert doc["schemes"] == ["https"]
+    assert len(manager.doc_cache) == 2
+
+
+def make_models(count, base=None):
+    base = base or declarative_base()
+    return [
+        type(
+            "Model{0}".format(i),
+            (base,),
+            {
+                "__tablename__": "model{0}".format(i),
+                "id": Column(Integer, primary_key=True),
+                "name": Column(String(32)),
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def unresolved_refs(doc):
+    """Yield every local ``$ref`` in `doc` that points nowhere."""
+    stack = [doc]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/"):
+                section, _, name = ref[2:].partition("/")
+                if name not in doc.get(section, {}):
+                    yield ref
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def test_managers_do_not_share_specs(session):
+    first_app, second_app = Flask("first"), Flask("second")
+    first = SwagAPIManager(first_app, session=session)
+    second = SwagAPIManager(second_app, session=session)
+    first.create_api(Person)
+    first.title = "First API"
+
+    assert "Person" in first.to_json()
+    assert "Person" not in second.to_json()
+    doc = second_app.test_client().get("/dbdoc.json").get_json()
+    assert doc["definitions"] == {}
+    assert doc["info"]["title"] == "DB API"
+
+
+def test_snapshot_is_read_only(manager):
+    manager.create_api(Person)
+    snapshot = manager.snapshot
+    with pytest.raises(TypeError):
+        snapshot.spec["definitions"]["Person"]["properties"]["name"] = {}
+    manager.add_model(Article)
+    assert manager.snapshot.generation > snapshot.generation
+    assert "Article" not in snapshot.spec["definitions"]
+
+
+def test_sequential_registration_scales_linearly():
+    import gc
+
+    from sqlalchemy.orm import configure_mappers
+
+    manager = SwagAPIManager()
+    models = make_models(2000)
+    configure_mappers()
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for start in range(0, len(models), 250):
+            started = time.perf_counter()
+            for model in models[start : start + 250]:
+                manager.add_model(model, methods=["GET", "POST", "PATCH", "DELETE"])
+            timings.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    assert len(manager.snapshot.spec["definitions"]) >= len(models)
+    # Quadratic publishing made the late batches several times slower.
+    assert min(timings[-2:]) / min(timings[:2]) < 2
+
+
+def test_doc_json_concurrent_with_registration(app, manager):
+    models = make_models(60)
+    client = app.test_client()
+    client.get("/dbdoc.json")
+    errors = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            doc = client.get("/dbdoc.json").get_json()
+            errors.extend(unresolved_refs(doc))
+            for name in doc["definitions"]:
+                if name.startswith("Model") and name.endswith("Document"):
+                    continue
+                if "/" + name.lower() not in doc["paths"]:
+                    errors.append(name)
+
+    def write(chunk):
+        for model in chunk:
+            manager.add_model(model, methods=["GET", "POST", "PATCH"])
+
+    readers = [threading.Thread(target=read) for _ in range(8)]
+    writers = [threading.Thread(target=write, args=(models[i::4],)) for i in range(4)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    doc = client.get("/dbdoc.json").get_json()
+    assert len(doc["paths"]) == 2 * len(models)
+
+
+def test_lazy_spec_build(app, session):
+    manager = SwagAPIManager(app, session=session, spec_build="lazy")
+    manager.create_api(Person)
+    assert manager.swagger["definitions"] == {}
+
+    doc = app.test_client().get("/dbdoc.json").get_json()
+    assert "Person" in doc["definitions"]
+    assert "/person" in doc["paths"]
+
+
+def test_background_spec_build(app, session):
+    manager = SwagAPIManager(app, session=session, spec_build="background")
+    manager.create_api(Person)
+    app.test_client().get("/db/person")
+    manager.start_background_build().join()
+    assert "Person" in manager.swagger["definitions"]
+
+
+def test_invalid_spec_build(app, session):
+    with pytest.raises(ValueError):
+        SwagAPIManager(app, session=session, spec_build="never")
+
+
+def test_type_resolver():
+    from sqlalchemy import BigInteger, DateTime, Numeric, types
+    from sqlalchemy.dialects import postgresql
+
+    from flask_restless_swagger import TypeResolver, type_resolver
+
+    class Upper(types.TypeDecorator):
+        impl = String
+        cache_ok = True
+
+    assert type_resolver.resolve(BigInteger()) == {"type": "integer", "format": "int64"}
+    assert type_resolver.resolve(postgresql.TIMESTAMP()) == {
+        "type": "string",
+        "format": "date-time",
+    }
+    assert type_resolver.resolve(Upper()) == {"type": "string"}
+    assert type_resolver.resolve(Numeric(10, 2)) == {"type": "number"}
+
+    resolver = TypeResolver()
+    resolver.register(Upper, "string", "uppercase")
+    assert resolver.resolve(Upper()) == {"type": "string", "format": "uppercase"}
+    assert resolver.resolve(DateTime()) == {"type": "string"}
+
+
+def test_definition_types(manager):
+    manager.create_api(Person)
+    properties = manager.swagger["definitions"]["Person"]["properties"]
+    assert properties["name"] == {"type": "string", "maxLength": 64}
+    assert "id" not in properties
+
+
+def test_build_command_and_artifact(app, manager, session, tmp_path):
+    manager.create_api(Person, methods=["GET", "POST"])
+    output = str(tmp_path / "dist" / "dbdoc")
+    result = app.test_cli_runner().invoke(args=["swagger", "build", "-o", output])
+    assert result.exit_code == 0, result.output
+
+    with open(output + ".json") as f:
+        spec = json.load(f)
+    assert spec["basePath"] == "/db"
+    assert "Person" in spec["definitions"]
+    with open(output + ".yaml") as f:
+        assert "Person:" in f.read()
+
+    served_app = Flask("served", root_path=str(tmp_path))
+    served = SwagAPIManager(
+        served_app, session=session, spec_artifact="dist/served.json"
+    )
+    served.create_api(Person, methods=["GET", "POST"])
+    assert served.swagger["definitions"] == {}
+
+    client = served_app.test_client()
+    assert client.get("/dbdoc.json").status_code == 404
+    assert client.get("/dbdoc/index.json").status_code == 404
+    assert served.swagger["definitions"] == {}
+    # Relative outputs and the configured artifact share the app root.
+    runner = served_app.test_cli_runner()
+    result = runner.invoke(args=["swagger", "build", "-o", "dist/other", "--no-yaml"])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "dist" / "other.json").exists()
+    result = runner.invoke(args=["swagger", "build"])
+    assert result.exit_code == 0, result.output
+
+    response = client.get("/dbdoc.json")
+    assert json.loads(response.data) == spec
+    etag = response.headers["ETag"]
+    response = client.get("/dbdoc.json", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert client.get("/dbdoc.yaml").status_code == 200
+    assert client.get("/dbdoc/index.json").status_code == 404
+    assert client.get("/dbdoc/models/Person.json").status_code == 404
+
+    # A rebuilt artifact gets a new ETag.
+    spec["info"]["title"] = "Rebuilt API"
+    (tmp_path / "dist" / "served.json").write_text(json.dumps(spec))
+    response = client.get("/dbdoc.json", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["info"]["title"] == "Rebuilt API"
+
+
+def test_shared_components(manager):
+    manager.create_api(Person, methods=["GET", "POST", "PATCH", "DELETE"])
+    manager.create_api(Article, methods=["GET", "POST"])
+    spec = json.loads(manager.to_json())
+    assert list(unresolved_refs(spec)) == []
+
+    item = spec["paths"]["/person/{personId}"]
+    id_ref = {"$ref": "#/parameters/personId"}
+    assert item["get"]["parameters"] == [id_ref]
+    assert item["delete"]["parameters"] == [id_ref]
+    assert item["patch"]["parameters"] == [id_ref, {"$ref": "#/parameters/PersonBody"}]
+    assert spec["paths"]["/person"]["post"]["parameters"] == [
+        {"$ref": "#/parameters/PersonBody"}
+    ]
+    assert spec["paths"]["/article"]["get"]["parameters"] == [
+        {"$ref": "#/parameters/q"}
+    ]
+    assert spec["parameters"]["PersonBody"]["schema"] == {
+        "$ref": "#/definitions/PersonDocument"
+    }
+
+
+def test_component_names_yield_to_models():
+    class PersonDocument(declarative_base()):
+        __tablename__ = "person_document"
+        id = Column(Integer, primary_key=True)
+        body = Column(Text)
+
+    manager = SwagAPIManager()
+    manager.add_model(Person, methods=["GET", "POST"])
+    manager.add_model(PersonDocument, methods=["GET", "POST"])
+    spec = manager.snapshot.spec
+    assert list(unresolved_refs(thaw(spec))) == []
+    assert "body" in spec["definitions"]["PersonDocument"]["properties"]
+    envelope = spec["parameters"]["PersonBody"]["schema"]["$ref"].rsplit("/", 1)[1]
+    assert envelope != "PersonDocument"
+    assert "data" in spec["definitions"][envelope]["properties"]
+    assert spec["parameters"]["PersonDocumentBody"]["schema"] == {
+        "$ref": "#/definitions/PersonDocumentDocument"
+    }
+
+
+def test_spec_size_regression():
+    manager = SwagAPIManager()
+    models = make_models(1000)
+    with manager.spec_store.edit():
+        for model in models:
+            manager.add_model(model, methods=["GET", "POST", "PATCH", "DELETE"])
+    spec = manager.to_json(separators=(",", ":"))
+    # 1480 bytes per model before operations shared their components.
+    assert len(spec) / len(models) < 1300
+
+
+def test_streamed_doc_json(app, session):
+    manager = SwagAPIManager(app, session=session, stream_doc=True)
+    manager.create_api(Person, methods=["GET", "POST"])
+    response = app.test_client().get("/dbdoc.json")
+    assert response.is_streamed
+    assert "Content-Length" not in response.headers
+    assert response.get_json() == json.loads(
+        manager.render_doc(manager.snapshot.spec, "localhost", "http", "/db").body
+    )
+
+
+def test_write_json_memory_is_flat():
+    import io
+    import tracemalloc
+
+    class Sink(io.TextIOBase):
+        def write(self, chunk):
+            return len(chunk)
+
+    def peak(count):
+        manager = SwagAPIManager()
+        with manager.spec_store.edit():
+            for model in make_models(count):
+                manager.add_model(model, methods=["GET", "POST", "PATCH", "DELETE"])
+        buffer = io.StringIO()
+        manager.write_json(buffer)
+        assert json.loads(buffer.getvalue()) == json.loads(manager.to_json())
+
+        tracemalloc.start()
+        manager.write_json(Sink())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    small, large = peak(300), peak(1200)
+    assert large < small * 1.2
+
+
+def test_model_fragments(app, manager):
+    manager.create_api(Person, methods=["GET", "POST", "PATCH"])
+    manager.create_api(Article)
+    client = app.test_client()
+
+    index = client.get("/dbdoc/index.json").get_json()
+    assert [m["name"] for m in index["models"]] == ["Article", "Person"]
+    assert index["models"][1]["fragment"] == {"$ref": "models/Person.json"}
+
+    fragment = client.get("/dbdoc/models/Person.json").get_json()
+    assert sorted(fragment["paths"]) == ["/person", "/person/{personId}"]
+    assert sorted(fragment["definitions"]) == ["Person", "PersonDocument"]
+    assert list(unresolved_refs(fragment)) == []
+    assert client.get("/dbdoc/models/Nobody.json").status_code == 404
+
+    rendered = manager.render_fragment("Person")
+    assert manager.render_fragment("Person") is rendered
+    manager.add_model(Article, methods=["GET", "DELETE"])
+    assert manager.render_fragment("Person") is rendered
+    assert (
+        "delete"
+        in json.loads(manager.render_fragment("Article").body)["paths"][
+            "/article/{articleId}"
+        ]
+    )
+    manager.add_model(Person)
+    assert manager.render_fragment("Person") is not rendered
+
+
+def test_fragment_external_refs():
+    from flask_restless_swagger.fragments import build_fragment
+
+    spec = {
+        "swagger": "2.0",
+        "info": {},
+        "paths": {"/a": {"get": {"responses": {200: {"$ref": "#/responses/A"}}}}},
+        "definitions": {"A": {"properties": {"b": {"$ref": "#/definitions/B"}}}},
+        "responses": {"A": {"schema": {"$ref": "#/definitions/A"}}},
+    }
+    fragment = build_fragment(spec, "A", ["/a"], {"A": None, "B": None})
+    assert fragment["definitions"]["A"]["properties"]["b"] == {
+        "$ref": "B.json#/definitions/B"
+    }
+    assert fragment["responses"]["A"] == spec["responses"]["A"]
+
+
+def test_stats_endpoint(app, session):
+    manager = SwagAPIManager(app, session=session, stats=True)
+    events = []
+    manager.hooks.connect("doc_served", lambda **data: events.append(data))
+    manager.create_api(Person, methods=["GET", "POST"])
+    client = app.test_client()
+    etag = client.get("/dbdoc.json").headers["ETag"]
+    client.get("/dbdoc.json", headers={"If-None-Match": etag})
+
+    stats = client.get("/dbdoc/_stats").get_json()
+    assert stats["models"]["Person"]["columns"] == 2
+    assert stats["models"]["Person"]["create_api_seconds"] > 0
+    assert stats["requests"] == {"spec": 2}
+    assert stats["statuses"] == {"200": 1, "304": 1}
+    assert stats["renders"]["spec"]["count"] == 1
+    assert stats["renders"]["spec"]["size"] > 0
+    assert events == [
+        {"document": "spec", "status": 200},
+        {"document": "spec", "status": 304},
+    ]
+
+
+def test_hooks_reject_unknown_events(manager):
+    assert not manager.hooks
+    with pytest.raises(ValueError):
+        manager.hooks.connect("nope", print)
+
+
+def test_doc_yaml(app, manager):
+    import yaml
+
+    manager.create_api(Person)
+    client = app.test_client()
+    response = client.get("/dbdoc.yaml")
+    assert response.mimetype == "application/yaml"
+    doc = yaml.safe_load(response.data)
+    assert doc["host"] == "localhost"
+    assert "Person" in doc["definitions"]
+    assert len(manager.doc_cache) == 1
+    etag = response.headers["ETag"]
+    assert client.get("/dbdoc.yaml", headers={"If-None-Match": etag}).status_code == 304
+    assert json.loads(json.dumps(yaml.safe_load(manager.to_yaml()))) == json.loads(
+        manager.to_json()
+    )
+
+
+def test_json_backends(app, session):
+    pytest.importorskip("orjson")
+    manager = SwagAPIManager(app, session=session, json_backend="orjson")
+    manager.create_api(Person, methods=["GET", "POST"])
+    assert json.loads(manager.to_json()) == json.loads(manager.to_json(backend="json"))
+    assert json.loads(manager.to_json(indent=2, sort_keys=True)) == json.loads(
+        manager.to_json(backend="json")
+    )
+    doc = app.test_client().get("/dbdoc.json").get_json()
+    assert doc["paths"]["/person"]["get"]["responses"]["200"]
+    assert str(manager).startswith('{\n    "swagger": "2.0",')
+    with pytest.raises(ValueError, match="orjson"):
+        manager.to_json(indent=4)
+    with pytest.raises(ValueError, match="orjson.*separators"):
+        manager.to_json(separators=(",", ":"))
+
+
+def test_unknown_json_backend(app, session):
+    with pytest.raises(ValueError):
+        SwagAPIManager(app, session=session, json_backend="xml")
+
+
+def test_create_apis(app, manager):
+    generations = []
+    manager.spec_store.listeners.append(
+        lambda snapshot: generations.append(snapshot.generation)
+    )
+    created = manager.create_apis(
+        Base, {"methods": ["GET"]}, Person={"methods": ["GET", "POST"]}
+    )
+    assert created == [Article, Person]
+    manager.snapshot
+    assert len(generations) == 1
+
+    doc = app.test_client().get("/dbdoc.json").get_json()
+    assert set(doc["paths"]["/person"]) == {"get", "post", "description"}
+    assert set(doc["paths"]["/article"]) == {"get"}
+    assert app.test_client().get("/db/article").status_code == 200
+
+
+def test_create_apis_skips_models(manager):
+    assert manager.create_apis([Person, Article], Article=None) == [Person]
+    assert list(manager.swagger["definitions"]) == ["Person"]
+
+
+def test_doc_json_since(app, manager):
+    manager.create_api(Person, methods=["GET", "POST"])
+    client = app.test_client()
+    response = client.get("/dbdoc.json")
+    version = response.headers["X-Spec-Version"]
+    assert version == manager.spec_version
+
+    manager.add_model(Article, methods=["GET", "PATCH"])
+    changes = client.get("/dbdoc.json?since=" + version).get_json()
+    assert changes["since"] == version
+    assert changes["version"] == manager.spec_version
+    assert sorted(changes["paths"]) == ["/article", "/article/{articleId}"]
+    assert sorted(changes["definitions"]) == ["Article", "ArticleDocument"]
+    assert changes["parameters"].keys() == {"articleId", "ArticleBody"}
+    assert changes["removed"] == {}
+    assert changes["info"]["title"] == "DB API"
+
+    latest = client.get("/dbdoc.json?since=" + changes["version"]).get_json()
+    assert "paths" not in latest
+    epoch, generation = version.split(".")
+    ahead = "%s.%d" % (epoch, int(generation) + 100)
+    assert client.get("/dbdoc.json?since=" + ahead).status_code == 400
+    assert client.get("/dbdoc.json?since=abc").status_code == 400
+
+    # Versions issued by another process or run get the whole document.
+    restarted = SwagAPIManager(Flask("restarted"), session=manager.manager.session)
+    assert restarted.spec_version.split(".")[0] != epoch
+    for stale in (restarted.spec_version, generation):
+        full = client.get("/dbdoc.json?since=" + stale).get_json()
+        assert "since" not in full
+        assert sorted(full["definitions"]) == sorted(
+            manager.snapshot.spec["definitions"]
+        )
+
+
+def test_changes_since_removed(manager):
+    from flask_restless_swagger.spec import changes_since
+
+    manager.add_model(Person)
+    version = manager.snapshot.generation
+    with manager.spec_store.edit() as spec:
+        del spec["paths"]["/person/{personId}"]
+    changed, removed = changes_since(manager.snapshot, version)
+    assert changed == {}
+    assert removed == {"paths": ["/person/{personId}"]}
+
+
+def test_request_validation(app, manager, session):
+    manager.create_api(Person, methods=["POST", "PATCH"], validate=True)
+    client = app.test_client()
+    headers = {"Content-Type": "application/vnd.api+json"}
+
+    def post(attributes):
+        body = {"data": {"type": "person", "attributes": attributes}}
+        return client.post("/db/person", json=body, headers=headers)
+
+    response = post({"name": 42})
+    assert response.status_code == 400
+    error = response.get_json()["errors"][0]
+    assert error["source"] == {"pointer": "/data/attributes/name"}
+    assert "must be of type string" in error["detail"]
+    assert post({"name": "x" * 65}).status_code == 400
+    assert post({"nickname": "x"}).status_code == 400
+    assert session.query(Person).count() == 0
+
+    assert post({"name": "Ada"}).status_code == 201
+    body = {"data": {"type": "person", "id": "1", "attributes": {"bio": 1}}}
+    assert client.patch("/db/person/1", json=body, headers=headers).status_code == 400
+
+
+def test_validation_accepts_excluded_columns(app, manager, session):
+    manager.create_api(
+        Person, methods=["POST"], validate=True, bulk=True, exclude_columns=["bio"]
+    )
+    assert "bio" not in manager.swagger["definitions"]["Person"]["properties"]
+    client = app.test_client()
+    headers = {"Content-Type": "application/vnd.api+json"}
+    resource = {"type": "person", "attributes": {"name": "a", "bio": "b"}}
+
+    response = client.post("/db/person", json={"data": resource}, headers=headers)
+    assert response.status_code == 201, response.data
+    response = client.post(
+        "/db/person/_bulk", json={"data": [resource]}, headers=headers
+    )
+    assert response.status_code == 201, response.data
+    assert [person.bio for person in session.query(Person)] == ["b", "b"]
+    resource["attributes"]["nickname"] = "c"
+    response = client.post("/db/person", json={"data": resource}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_compile_validator():
+    from flask_restless_swagger.validation import compile_validator
+
+    validate = compile_validator(
+        {
+            "properties": {
+                "count": {"type": "integer"},
+                "kind": {"type": "string", "enum": ["a", "b"]},
+            },
+            "required": ["count"],
+        }
+    )
+    assert validate({"count": 1, "kind": "a"}, False) == []
+    assert validate({"kind": "a"}, True) == []
+    assert validate({"kind": "c"}, False) == [
+        ("count", "is required"),
+        ("kind", "is not one of the allowed values"),
+    ]
+    assert validate({"count": True}, False) == [("count", "must be of type integer")]
+    assert validate([], False) == [("", "attributes must be an object")]
+
+
+IndexedBase = declarative_base()
+
+
+class Order(IndexedBase):
+    __tablename__ = "orders"
+    id = Column(Integer, primary_key=True)
+    reference = Column(String(16), unique=True)
+    customer = Column(String(32), index=True)
+    note = Column(Text)
+
+
+class Supplier(IndexedBase):
+    __tablename__ = "suppliers"
+    id = Column(Integer, primary_key=True)
+    code_ = Column("code", String(16), index=True)
+    name_ = Column("name", String(32))
+
+
+@pytest.fixture
+def order_session():
+    engine = create_engine("sqlite://")
+    IndexedBase.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    yield session
+    session.remove()
+
+
+def test_x_indexed(app, order_session):
+    manager = SwagAPIManager(app, session=order_session)
+    manager.create_api(Order)
+    properties = manager.swagger["definitions"]["Order"]["properties"]
+    assert properties["reference"]["x-indexed"] is True
+    assert properties["customer"]["x-indexed"] is True
+    assert "x-indexed" not in properties["note"]
+
+
+def test_query_guard(app, order_session, caplog):
+    manager = SwagAPIManager(app, session=order_session)
+    manager.create_api(Order, query_guard="reject")
+    client = app.test_client()
+
+    def get(filters=None, sort=None):
+        params = {}
+        if filters is not None:
+            params["filter[objects]"] = json.dumps(filters)
+        if sort is not None:
+            params["sort"] = sort
+        return client.get("/db/orders", query_string=params)
+
+    assert get([{"name": "customer", "op": "eq", "val": "a"}]).status_code == 200
+    assert get(sort="-reference").status_code == 200
+    response = get([{"or": [{"name": "note", "op": "like", "val": "%a%"}]}])
+    assert response.status_code == 400
+    assert "note" in response.get_json()["errors"][0]["detail"]
+    assert get(sort="note").status_code == 400
+
+    warn_app = Flask("warn")
+    SwagAPIManager(warn_app, session=order_session).create_api(
+        Order, query_guard="warn"
+    )
+    response = warn_app.test_client().get("/db/orders", query_string={"sort": "note"})
+    assert response.status_code == 200
+    assert "unindexed column(s): note" in caplog.text
+
+
+def test_query_guard_attribute_names(app, order_session):
+    manager = SwagAPIManager(app, session=order_session)
+    manager.create_api(Supplier, query_guard="reject")
+    client = app.test_client()
+
+    def sort(field):
+        return client.get("/db/suppliers", query_string={"sort": field})
+
+    assert sort("code_").status_code == 200
+    response = sort("name_")
+    assert response.status_code == 400
+    assert "name_" in response.get_json()["errors"][0]["detail"]
+
+
+def test_cached_ui_assets(app, session):
+    import re
+
+    SwagAPIManager(app, session=session, cache_ui_assets=True)
+    client = app.test_client()
+    page = client.get("/dbdoc/")
+    assert page.headers["Cache-Control"] == "no-cache"
+    bundle_url = re.search(r'src="(/dbdoc/swagger-ui-bundle\.\w+\.js)"', page.text)
+    assert bundle_url
+
+    response = client.get(bundle_url.group(1), headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    plain = client.get(bundle_url.group(1))
+    assert gzip.decompress(response.data) == plain.data
+    assert "Content-Encoding" not in plain.headers
+    plain.close()
+
+    etag = response.headers["ETag"]
+    response = client.get(
+        bundle_url.group(1), headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert client.get("/dbdoc/swagger-ui.css").headers["Cache-Control"] == "no-cache"
+    assert client.get("/dbdoc/missing.js").status_code == 404
+    source_map = client.get(
+        "/dbdoc/swagger-ui.css.map", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "Content-Encoding" not in source_map.headers
+    source_map.close()
+
+
+def test_ui_assets_compressed_on_demand(app):
+    from flask_restless_swagger.ui import StaticBundle, swagger_ui_root
+
+    bundle = StaticBundle(os.path.join(swagger_ui_root(), "dist"))
+    assert bundle.compressed == {}
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = bundle.serve(bundle.fingerprints["swagger-ui.css"])
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert list(bundle.compressed) == [os.path.join(bundle.directory, "swagger-ui.css")]
+
+
+def test_model_introspection():
+    from sqlalchemy.ext.associationproxy import association_proxy
+    from sqlalchemy.ext.hybrid import hybrid_property
+
+    from flask_restless_swagger.introspection import inspect_model
+
+    IntrospectedBase = declarative_base()
+
+    class Tag(IntrospectedBase):
+        __tablename__ = "tag"
+        id = Column(Integer, primary_key=True)
+        label = Column(String(20))
+        post_id = Column(Integer, ForeignKey("post.id"))
+
+    class Post(IntrospectedBase):
+        __tablename__ = "post"
+        id = Column(Integer, primary_key=True)
+        body = Column(Text)
+        tags = relationship(Tag, backref="post")
+        labels = association_proxy("tags", "label")
+
+        @hybrid_property
+        def length(self):
+            """Length of the body."""
+            return len(self.body)
+
+        @length.expression
+        def length(cls):
+            from sqlalchemy import func
+
+            return func.char_length(cls.body)
+
+        @hybrid_property
+        def shout(self):
+            """The body in capitals."""
+            return self.body.upper()
+
+    assert inspect_model(Post) is inspect_model(Post)
+    manager = SwagAPIManager()
+    manager.add_model(Post, methods=["GET"])
+    manager.add_model(Tag, methods=["GET"])
+    post = manager.swagger["definitions"]["Post"]
+    assert post["properties"]["length"] == {
+        "type": "integer",
+        "format": "int32",
+        "readOnly": True,
+        "description": "Length of the body.",
+    }
+    # Python-only hybrids are documented without evaluating them.
+    assert post["properties"]["shout"] == {
+        "type": "string",
+        "readOnly": True,
+        "description": "The body in capitals.",
+    }
+    assert post["properties"]["labels"] == {
+        "type": "array",
+        "items": {"type": "string", "maxLength": 20},
+    }
+    assert post["x-relationships"] == {
+        "tags": {"model": "Tag", "direction": "ONETOMANY", "uselist": True}
+    }
+    tag = manager.swagger["definitions"]["Tag"]
+    assert tag["x-relationships"]["post"]["direction"] == "MANYTOONE"
+    assert tag["x-relationships"]["post"]["uselist"] is False
+
+
+def serve_shared_spec(manager, barrier, results):
+    """A pre-fork worker: wait for its siblings, then serve the spec once."""
+    barrier.wait()
+    client = manager.app.test_client()
+    plain = client.get("/dbdoc.json")
+    compressed = client.get("/dbdoc.json", headers={"Accept-Encoding": "gzip"})
+    since = client.get("/dbdoc.json", query_string={"since": "0"})
+    yaml_doc = client.get("/dbdoc.yaml")
+    index = client.get("/dbdoc/index.json")
+    results.put(
+        (
+            manager.shared_spec.built,
+            len(manager._pending),
+            (since.data == plain.data, yaml_doc.status_code, index.status_code),
+            yaml_doc.data,
+            plain.data,
+            gzip.decompress(compressed.data),
+            plain.headers["ETag"],
+        )
+    )
+
+
+def run_workers(manager, count):
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(count)
+    results = context.Queue()
+    workers = [
+        context.Process(target=serve_shared_spec, args=(manager, barrier, results))
+        for _ in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    return outcomes
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_shared_spec_across_workers(session, tmp_path):
+    import yaml
+
+    app = Flask("prefork")
+    manager = SwagAPIManager(
+        app,
+        session=session,
+        spec_build="shared",
+        spec_path=str(tmp_path / "dbdoc.json"),
+    )
+    manager.create_api(Person, methods=["GET", "POST"])
+    manager.create_api(Article)
+
+    # Workers race for the lock; exactly one introspects and writes.
+    outcomes = run_workers(manager, 6)
+    assert sorted(built for built, *_ in outcomes) == [False] * 5 + [True]
+    assert sorted(pending for _, pending, *_ in outcomes) == [0] + [2] * 5
+    assert {statuses for _, _, statuses, *_ in outcomes} == {(True, 200, 404)}
+    bodies = {body for *_, body, _, _ in outcomes}
+    assert len(bodies) == 1
+    assert {unzipped for *_, unzipped, _ in outcomes} == bodies
+    spec = json.loads(bodies.pop())
+    assert spec["basePath"] == "/db"
+    assert "Article" in spec["definitions"]
+    (yaml_doc,) = {yaml_doc for _, _, _, yaml_doc, *_ in outcomes}
+    assert json.loads(json.dumps(yaml.safe_load(yaml_doc))) == spec
+
+    # A preloading master builds it before forking; no worker builds.
+    manager.title = "Renamed"
+    manager.share_spec()
+    assert manager.shared_spec.built
+    (written,) = tmp_path.glob("dbdoc.*.json")
+    mtime = written.stat().st_mtime_ns
+    outcomes = run_workers(manager, 3)
+    assert written.stat().st_mtime_ns == mtime
+    assert json.loads(outcomes[0][4])["info"]["title"] == "Renamed"
+    assert list(tmp_path.glob("dbdoc.*.json")) == [written]
+    assert len(list(tmp_path.glob("dbdoc.*.yaml"))) == 1
+
+    client = app.test_client()
+    etag = client.get("/dbdoc.json").headers["ETag"]
+    assert client.get("/dbdoc.json", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_spec_fingerprint_covers_the_spec():
+    from sqlalchemy import Index
+
+    def fingerprint(doc=None, index=False, related=False, column_doc=None):
+        base = declarative_base()
+
+        class Owner(base):
+            __tablename__ = "owner"
+            id = Column(Integer, primary_key=True)
+
+        class Item(base):
+            __tablename__ = "item"
+            id = Column(Integer, primary_key=True)
+            name = Column(String(20), doc=column_doc)
+            owner_id = Column(Integer, ForeignKey("owner.id"))
+            if related:
+                owner = relationship(Owner)
+
+        Item.__doc__ = doc
+        if index:
+            Index("ix_item_name", Item.name)
+        manager = SwagAPIManager()
+        manager.model_definition = None  # not called: nothing is documented
+        manager.registrations.append((Item, {"methods": ["GET"]}))
+        return manager.spec_fingerprint()
+
+    plain = fingerprint()
+    assert fingerprint() == plain
+    assert fingerprint(doc="An item.") != plain
+    assert fingerprint(column_doc="Its name.") != plain
+    assert fingerprint(index=True) != plain
+    assert fingerprint(related=True) != plain
+
+
+def test_loadtest_command(app, manager):
+    manager.create_api(Person, methods=["GET", "POST", "PATCH", "DELETE"])
+    manager.create_api(Article, methods=["GET"])
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        args=["swagger", "loadtest", "-n", "200", "-t", "2", "--rows", "10", "--json"]
+    )
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.output)
+    assert report["requests"] == 200
+    endpoints = report["endpoints"]
+    assert set(endpoints) <= {
+        "GET /person",
+        "GET /person/{personId}",
+        "POST /person",
+        "PATCH /person/{personId}",
+        "DELETE /person/{personId}",
+        "GET /article",
+        "GET /article/{articleId}",
+    }
+    assert "GET /article/{articleId}" in endpoints
+    for endpoint in endpoints.values():
+        assert endpoint["p50_ms"] <= endpoint["p95_ms"] <= endpoint["p99_ms"]
+    assert endpoints["POST /person"]["errors"] == 0
+
+    result = runner.invoke(args=["swagger", "loadtest", "--mix", "get=1,head=2"])
+    assert result.exit_code == 2
+    assert "Invalid mix entry" in result.output
+
+
+def test_bulk_create(app, manager, session):
+    manager.create_api(Person, methods=["GET", "POST"], bulk=2)
+    spec = json.loads(manager.to_json())
+    # Registering the model again adds a second bulk endpoint.
+    manager.create_api(Person, methods=["POST"], bulk=True, url_prefix="/v2")
+    assert list(unresolved_refs(spec)) == []
+    operation = spec["paths"]["/person/_bulk"]["post"]
+    assert operation["parameters"][0]["schema"] == {
+        "$ref": "#/definitions/PersonBulkDocument"
+    }
+
+    client = app.test_client()
+
+    def post(resources):
+        return client.post(
+            "/db/person/_bulk",
+            data=json.dumps({"data": resources}),
+            content_type="application/vnd.api+json",
+        )
+
+    people = [{"type": "person", "attributes": {"name": "p%d" % i}} for i in range(5)]
+    people[3]["attributes"]["bio"] = "writes"
+    response = post(people)
+    assert response.status_code == 201
+    assert response.get_json()["meta"]["created"] == 5
+    assert session.query(Person).count() == 5
+    assert session.query(Person).filter_by(name="p3").one().bio == "writes"
+
+    response = post(people[:2] + [{"type": "person", "attributes": {"name": 7}}])
+    assert response.status_code == 400
+    assert response.get_json()["errors"][0]["source"]["pointer"] == (
+        "/data/2/attributes/name"
+    )
+    assert post([{"type": "article", "attributes": {}}]).status_code == 409
+    assert session.query(Person).count() == 5
+
+    response = client.post(
+        "/v2/person/_bulk",
+        data=json.dumps({"data": people[:1]}),
+        content_type="application/vnd.api+json",
+    )
+    assert response.status_code == 201
+    assert session.query(Person).count() == 6
+
+
+def test_bulk_create_runs_preprocessors(app, manager, session):
+    from flask import request
+    from flask_restless import ProcessingException
+
+    def require_login(data=None, **kwargs):
+        if "Authorization" not in request.headers:
+            raise ProcessingException(status=401, detail="Log in first")
+        data["data"]["attributes"]["title"] += "!"
+
+    manager.create_api(
+        Article,
+        methods=["POST"],
+        bulk=True,
+        preprocessors={"POST_RESOURCE": [require_login]},
+    )
+    client = app.test_client()
+    body = json.dumps({"data": [{"type": "article", "attributes": {"title": "t"}}]})
+
+    def post(url, **headers):
+        return client.post(
+            url, data=body, content_type="application/vnd.api+json", headers=headers
+        )
+
+    assert post("/db/article/_bulk").status_code == 401
+    assert session.query(Article).count() == 0
+    assert post("/db/article/_bulk", Authorization="Bearer x").status_code == 201
+    assert session.query(Article).one().title == "t!"
+
+
+def test_bulk_requires_post(app, manager):
+    with pytest.raises(ValueError, match="POST"):
+        manager.create_api(Article, methods=["GET"], bulk=True)
+    with pytest.raises(ValueError, match="POST"):
+        manager.create_api(Article, bulk=100)
+    assert "/article/_bulk" not in manager.swagger["paths"]
+    manager.create_api(Article, methods=["get", "post"], bulk=True)
+    assert "/article/_bulk" in manager.swagger["paths"]
+
+
+def test_response_cache(app, session):
+    from flask_restless_swagger.response_cache import DictBackend
+
+    backend = DictBackend()
+    manager = SwagAPIManager(app, session=session, cache_backend=backend)
+    manager.create_api(Person, methods=["GET", "POST", "PATCH", "DELETE"], cache=True)
+    manager.create_api(Article, methods=["GET"], cache=30)
+    session.add_all([Person(name="a"), Article(title="t")])
+    session.commit()
+    client = app.test_client()
+
+    headers = manager.swagger["paths"]["/person"]["get"]["responses"][200]["headers"]
+    assert headers["X-Cache"]["enum"] == ["HIT", "MISS"]
+
+    first = client.get("/db/person?page[number]=1&page[size]=5")
+    assert first.headers["X-Cache"] == "MISS"
+    second = client.get("/db/person?page[size]=5&page[number]=1")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.data == first.data
+    revalidated = client.get(
+        "/db/person?page[size]=5&page[number]=1",
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+    assert client.get("/db/article").headers["X-Cache"] == "MISS"
+
+    response = client.patch(
+        "/db/person/1",
+        data=json.dumps(
+            {"data": {"type": "person", "id": "1", "attributes": {"name": "b"}}}
+        ),
+        content_type="application/vnd.api+json",
+    )
+    assert response.status_code in (200, 204)
+    refreshed = client.get("/db/person?page[number]=1&page[size]=5")
+    assert refreshed.headers["X-Cache"] == "MISS"
+    assert refreshed.get_json()["data"][0]["attributes"]["name"] == "b"
+    # Only the written model's responses are dropped.
+    assert client.get("/db/article").headers["X-Cache"] == "HIT"
+
+
+def test_response_cache_after_preprocessors(app, session):
+    from flask import request
+    from flask_restless import ProcessingException
+
+    def require_login(**kwargs):
+        if "Authorization" not in request.headers:
+            raise ProcessingException(status=401, detail="Log in first")
+
+    manager = SwagAPIManager(app, session=session)
+    login = {"GET_COLLECTION": [require_login], "GET_RESOURCE": [require_login]}
+    manager.create_api(Person, methods=["GET"], cache=True, preprocessors=login)
+    session.add(Person(name="a"))
+    session.commit()
+    client = app.test_client()
+
+    assert client.get("/db/person").status_code == 401
+    alice = {"Authorization": "Bearer alice"}
+    assert client.get("/db/person", headers=alice).headers["X-Cache"] == "MISS"
+    assert client.get("/db/person", headers=alice).headers["X-Cache"] == "HIT"
+    assert client.get("/db/person").status_code == 401
+    assert client.get("/db/person/1").status_code == 401
+    # Other credentials do not share alice's responses.
+    bob = {"Authorization": "Bearer bob"}
+    assert client.get("/db/person", headers=bob).headers["X-Cache"] == "MISS"
+
+
+def test_response_cache_relationship_writes(app, session):
+    manager = SwagAPIManager(app, session=session)
+    manager.create_api(
+        Person,
+        methods=["GET", "POST", "PATCH", "DELETE"],
+        cache=True,
+        allow_delete_from_to_many_relationships=True,
+        allow_to_many_replacement=True,
+    )
+    manager.create_api(Article, methods=["GET"])
+    session.add_all([Person(name="a"), Article(title="t")])
+    session.commit()
+    client = app.test_client()
+    linkage = json.dumps({"data": [{"type": "article", "id": "1"}]})
+
+    def articles():
+        response = client.get("/db/person/1?include=articles")
+        included = response.get_json().get("included", [])
+        return response.headers["X-Cache"], [article["id"] for article in included]
+
+    assert articles()[0] == "MISS"
+    for method in ("post", "delete", "patch"):
+        assert articles()[0] == "HIT"
+        response = getattr(client, method)(
+            "/db/person/1/relationships/articles",
+            data=linkage,
+            content_type="application/vnd.api+json",
+        )
+        assert response.status_code == 204, (method, response.data)
+        assert articles() == ("MISS", [] if method == "delete" else ["1"])
+
+
+def increment_shared(backend, times):
+    for _ in range(times):
+        backend.incr("hits")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_dict_backend_counters_across_processes():
+    import multiprocessing
+
+    from flask_restless_swagger.response_cache import DictBackend
+
+    context = multiprocessing.get_context("fork")
+    with context.Manager() as sync:
+        backend = DictBackend(store=sync.dict(), lock=sync.Lock())
+        workers = [
+            context.Process(target=increment_shared, args=(backend, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+        assert backend.counter("hits") == 200
+
+
+def test_memory_cache_backend():
+    from flask_restless_swagger.response_cache import MemoryBackend
+
+    now = [0.0]
+    backend = MemoryBackend(max_bytes=10, clock=lambda: now[0])
+    backend.set("a", b"1234", ttl=5)
+    backend.set("b", b"1234", ttl=60)
+    assert backend.get("a") == b"1234"
+    backend.set("c", b"1234", ttl=60)
+    assert backend.get("b") is None
+    assert backend.size == 8
+    now[0] = 10
+    assert backend.get("a") is None
+    assert backend.get("c") == b"1234"
+    assert backend.incr("generation") == 1
+    assert backend.counter("generation") == 1
+
+
+def test_fast_start(session):
+    import subprocess
+    import sys
+
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from flask_restless_swagger import *; "
+            "import flask_restless_swagger as m; getattr(m, '__wrapped__', None); "
+            "print(sorted(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert "'flask_restless'" not in imported
+    assert "'flask_swagger_ui'" not in imported
+    assert flask_restless_swagger.get_related_model is not None
+
+    for cache_ui_assets in (False, True):
+        app = Flask("fast")
+        SwagAPIManager(
+            app, session=session, fast_start=True, cache_ui_assets=cache_ui_assets
+        )
+        assert "swagger_ui.show" not in app.view_functions
+        client = app.test_client()
+        page = client.get("/dbdoc/")
+        assert page.status_code == 200
+        assert "/dbdoc.json" in page.text
+        response = client.get("/dbdoc/swagger-ui.css")
+        assert response.status_code == 200
+        response.close()
+
+
+def test_request_metrics(app, session):
+    manager = SwagAPIManager(
+        app, session=session, metrics=True, metrics_clients=("127.0.0.1", "::1")
+    )
+    manager.create_api(Person, methods=["GET"], cache=True)
+    session.add_all([Person(name="a"), Person(name="b")])
+    session.commit()
+    client = app.test_client()
+    for url in (
+        "/db/person/1",
+        "/db/person/2",
+        "/db/person/3",
+        "/db/person",
+        "/db/person",
+    ):
+        client.get(url)
+    client.get("/nowhere")
+
+    text = client.get("/metrics").text
+    series = 'method="GET",path="/db/person/{personId}"'
+    assert 'restless_http_requests_total{%s,status="2xx"} 2' % series in text
+    assert 'restless_http_requests_total{%s,status="4xx"} 1' % series in text
+    assert "restless_http_request_errors_total{%s} 0" % series in text
+    assert "restless_http_request_duration_seconds_count{%s} 3" % series in text
+    assert (
+        'restless_http_request_duration_seconds_bucket{%s,le="+Inf"} 3' % series in text
+    )
+    # Cache hits are raised as CacheHit from the last GET preprocessor and
+    # still timed.
+    assert (
+        'restless_http_request_duration_seconds_count{method="GET",path="/db/person"} 2'
+        in text
+    )
+    assert 'path="unmatched"' in text
+    assert "/metrics" not in text
+    assert (
+        client.get("/metrics", environ_base={"REMOTE_ADDR": "10.0.0.1"}).status_code
+        == 404
+    )
+
+    # Exposure is opt-in: without clients the route is not added.
+    private = Flask("private")
+    manager = SwagAPIManager(private, session=session, metrics=True)
+    assert private.test_client().get("/metrics").status_code == 404
+    assert "restless_http_requests_total" in manager.metrics.render()
+    networks = Flask("networks")
+    SwagAPIManager(
+        networks, session=session, metrics=True, metrics_clients=["10.0.0.0/8"]
+    )
+    client = networks.test_client()
+    assert client.get("/metrics").status_code == 404
+    assert (
+        client.get("/metrics", environ_base={"REMOTE_ADDR": "10.1.2.3"}).status_code
+        == 200
+    )
+
+
+def test_metrics_shards():
+    from flask_restless_swagger.metrics import Metrics
+
+    metrics = Metrics(buckets=(0.1, 1.0))
+
+    def record():
+        for _ in range(1000):
+            metrics.observe("GET", "/db/x", 200, 0.5)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.observe("GET", "/db/x", 503, 0.05)
+    # The shards of the exited threads were folded into one total.
+    assert len(metrics._shards) == 1
+    (series,) = metrics.collect().values()
+    assert series.count == 4001
+    assert series.errors == 1
+    assert series.buckets == [1, 4000, 0]
+    assert metrics.routes.template("/db/x/<int:id>/<name>") == "/db/x/{id}/{name}"
+
+
+def test_response_compression(app, session):
+    from flask_restless_swagger.compression import (
+        ResponseCompressor,
+        encoding_available,
+    )
+
+    compressor = ResponseCompressor(min_size=600, stream_size=2500)
+    assert "gzip" in compressor.encodings
+    assert ("br" in compressor.encodings) == encoding_available("br")
+    with pytest.raises(ValueError):
+        ResponseCompressor(encodings=("gzip", "lzma"))
+
+    manager = SwagAPIManager(app, session=session, compression=compressor)
+    manager.create_api(Person, methods=["GET"], cache=True)
+    manager.create_api(Article, methods=["GET"], compress=False)
+    session.add_all([Person(name="p%d" % i, bio="x" * 50) for i in range(30)])
+    session.add(Article(title="t" * 300))
+    session.commit()
+    client = app.test_client()
+
+    headers = manager.swagger["paths"]["/person"]["get"]["responses"][200]["headers"]
+    assert headers["Content-Encoding"]["enum"][-1] == "identity"
+    assert "X-Cache" in headers
+    assert (
+        "headers" not in manager.swagger["paths"]["/article"]["get"]["responses"][200]
+    )
+
+    plain = client.get("/db/person?page[size]=5")
+    assert len(client.get("/db/person?page[size]=1").data) < 600 <= len(plain.data)
+    small = client.get("/db/person?page[size]=1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["Vary"] == "Accept-Encoding"
+
+    page = client.get("/db/person?page[size]=5", headers={"Accept-Encoding": "gzip"})
+    assert page.headers["Content-Encoding"] == "gzip"
+    assert int(page.headers["Content-Length"]) == len(page.data)
+    assert gzip.decompress(page.data) == plain.data
+    etag = page.headers["ETag"]
+    assert etag.endswith('-gzip"')
+    revalidated = client.get(
+        "/db/person?page[size]=5",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert revalidated.status_code == 304
+
+    large = client.get("/db/person?page[size]=30", headers={"Accept-Encoding": "gzip"})
+    assert len(client.get("/db/person?page[size]=30").data) >= 2500
+    assert large.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in large.headers
+    assert len(json.loads(gzip.decompress(large.data))["data"]) == 30
+
+    article = client.get("/db/article", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in article.headers
+
+
+def test_request_hooks_only_for_used_features(app, session):
+    manager = SwagAPIManager(app, session=session, compression=True)
+    manager.create_api(Article, methods=["GET"], compress=False, cache=True)
+    assert app.before_request_funcs.get(None, []) == []
+    assert app.after_request_funcs.get(None, []) == []
+
+    manager.create_api(Person, methods=["GET"], default_fields=["name"])
+    assert app.before_request_funcs[None] == [manager.apply_default_fields]
+    assert app.after_request_funcs[None] == [manager.compress_response]
+
+
+def test_default_fields(app, session):
+    from sqlalchemy import event
+
+    manager = SwagAPIManager(app, session=session)
+    with pytest.raises(ValueError):
+        manager.create_api(Person, methods=["GET"], default_fields=["nickname"])
+    manager.create_api(Person, methods=["GET"], default_fields=["name"])
+    manager.create_api(Article, methods=["GET"])
+    session.add(Person(name="a", bio="b" * 100))
+    session.commit()
+    client = app.test_client()
+
+    parameters = manager.swagger["paths"]["/person"]["get"]["parameters"]
+    ref = parameters[-1]["$ref"].rsplit("/", 1)[1]
+    fields = manager.swagger["parameters"][ref]
+    assert fields["name"] == "fields[person]"
+    assert fields["default"] == ["name"]
+    assert "bio" in fields["items"]["enum"]
+    assert manager.swagger["paths"]["/person/{personId}"]["get"]["parameters"][-1] == {
+        "$ref": "#/parameters/" + ref
+    }
+    assert len(manager.swagger["paths"]["/article"]["get"]["parameters"]) == 1
+
+    statements = []
+    engine = session.get_bind()
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    response = client.get("/db/person")
+    assert response.get_json()["data"][0]["attributes"] == {"name": "a"}
+    assert not any("bio" in statement for statement in statements)
+    assert client.get("/db/person/1").get_json()["data"]["attributes"] == {"name": "a"}
+
+    statements.clear()
+    response = client.get("/db/person?fields[person]=bio")
+    assert response.get_json()["data"][0]["attributes"] == {"bio": "b" * 100}
+    assert not any("person.name" in statement for statement in statements)